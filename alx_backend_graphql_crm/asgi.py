@@ -2,6 +2,8 @@
 ASGI config for alx_backend_graphql_crm project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI, serve GraphQL from /graphql/async (crm.views.AsyncCRMGraphQLView),
+which executes the schema on the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
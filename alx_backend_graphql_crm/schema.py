@@ -18,6 +18,7 @@
 # schema = graphene.Schema(query=Query)
 
 import graphene
+from crm.async_schema import AsyncQuery as CRMAsyncQuery
 from crm.schema import Query as CRMQuery, Mutation as CRMMutation
 
 class Query(CRMQuery, graphene.ObjectType):
@@ -27,3 +28,10 @@ class Mutation(CRMMutation, graphene.ObjectType):
     pass
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
+
+# The same API with coroutine root resolvers, served by the async view.
+class AsyncQuery(CRMAsyncQuery, graphene.ObjectType):
+    class Meta:
+        name = "Query"
+
+async_schema = graphene.Schema(query=AsyncQuery, mutation=Mutation)
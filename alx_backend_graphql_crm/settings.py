@@ -80,9 +80,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # select_for_update() is a no-op on SQLite; take the write lock
+            # when a transaction begins instead of failing with "database is
+            # locked" when a reader tries to write (see bulk.reserve_stock).
+            'transaction_mode': 'IMMEDIATE',
+            # Run on every new connection. WAL lets readers carry on during
+            # a write, and NORMAL only syncs at checkpoints (still safe in
+            # WAL mode). Writers wait up to 5s for the lock; page cache
+            # 64 MiB, reads through a 256 MiB mmap, temp tables in memory.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # Keep connections open between requests (per thread). Checked
+        # before reuse, so a broken connection is replaced rather than
+        # failing a request.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Reads of GraphQL query operations (and the reporting jobs and the order
+# export) go to this DATABASES alias when it is configured, e.g. a copy of
+# the primary kept up to date by replication; see crm/routers.py. Mutations,
+# transactions and the rest of a request after a write use 'default'.
+#
+#   DATABASES['replica'] = {
+#       'ENGINE': 'django.db.backends.sqlite3',
+#       'NAME': BASE_DIR / 'replica.sqlite3',
+#       'OPTIONS': {'init_command': 'PRAGMA query_only=ON;'},
+#   }
+CRM_READ_REPLICA = 'replica'
+DATABASE_ROUTERS = ['crm.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -106,6 +142,73 @@ GRAPHENE = {
     "SCHEMA": "alx_backend_graphql_crm.schema.schema"
 }
 
+# Fraction of GraphQL requests profiled and logged to "crm.profile" (see
+# crm/profiling.py). Send an X-CRM-Profile header to profile one request
+# and get the report back in the response extensions (DEBUG or staff only).
+CRM_PROFILE_SAMPLE_RATE = 0.01
+
+# Parsed and validated GraphQL documents kept per process, keyed by the
+# SHA-256 of the query text (also the persisted-query hash, crm/documents.py).
+CRM_DOCUMENT_CACHE_SIZE = 256
+
+# Static limits checked before a GraphQL operation runs (crm/cost.py). Each
+# object field costs its weight (default 1) times the page sizes of the
+# lists above it: `first`/`last`, else SIZES or DEFAULT_LIST_SIZE.
+CRM_QUERY_COST = {
+    "MAX_COST": 10_000,
+    "MAX_DEPTH": 8,
+    "DEFAULT_LIST_SIZE": 100,
+    "SIZES": {"OrderType.products": 10},
+    "WEIGHTS": {
+        "*.totalCount": 10,
+        "Mutation.bulkCreateCustomers": 100,
+        "Mutation.bulkCreateOrders": 100,
+    },
+}
+
+# Opt-in cache for GraphQL query responses (crm/response_cache.py). Root
+# fields listed under FIELDS, with their TTL in seconds, make a query
+# cacheable; writes to Customer/Product/Order invalidate it. "CACHE" names
+# an alias in CACHES that every process (workers, management commands, cron
+# jobs) shares, e.g. RedisCache; a per-process LocMemCache is refused unless
+# "SINGLE_PROCESS" is True. For example:
+#
+# CACHES["graphql"] = {
+#     "BACKEND": "django.core.cache.backends.redis.RedisCache",
+#     "LOCATION": "redis://127.0.0.1:6379/1",
+# }
+# CRM_RESPONSE_CACHE = {
+#     "CACHE": "graphql",
+#     "FIELDS": {
+#         "Query.totalCustomers": 300,
+#         "Query.totalOrders": 300,
+#         "Query.totalRevenue": 300,
+#         "Query.allProducts": 60,
+#         "Query.products": 60,
+#     },
+# }
+CRM_RESPONSE_CACHE = None
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "graphql": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crm-graphql",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "crm.profile": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
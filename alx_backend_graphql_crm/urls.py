@@ -1,9 +1,14 @@
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from crm.export import export_orders
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("graphql", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql", csrf_exempt(CRMGraphQLView.as_view(graphiql=True))),
+    # Same schema with async root resolvers; use it when serving over ASGI.
+    path("graphql/async", csrf_exempt(AsyncCRMGraphQLView.as_view())),
+    # OrderFilter arguments in, every matching order streamed out.
+    path("graphql/export/orders", export_orders),
 ]
@@ -0,0 +1,149 @@
+"""
+Throughput of the sync /graphql view against the async /graphql/async view
+under concurrent clients.
+
+    python -m benchmarks.async_throughput --clients 1 8 32 --requests 400
+
+The sync view is driven by a pool of `clients` threads calling the WSGI
+application, the way a threaded WSGI server would run it; the async view
+by `clients` concurrent tasks calling the ASGI application on one event
+loop. Both run in-process against the same SQLite file, which is seeded
+with benchmarks.generate when empty.
+
+In-process SQLite answers in microseconds and holds the GIL, so workers
+barely wait on it. --db-latency-ms adds a sleep to every query to model
+the network round trip of a database server; that wait is what the async
+view can overlap.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import DEFAULT_DB, setup, wsgi_post
+
+OPERATIONS = [
+    "{ totalCustomers totalOrders totalRevenue }",
+    "{ allOrders(first: 20) { edges { node { id totalAmount customer { name } products { name } } } } }",
+    "{ allProducts(first: 50, stockLte: 10) { edges { node { name stock } } } }",
+    "{ allCustomers(first: 10) { edges { node { name orders(first: 5) { edges { node { totalAmount } } } } } } }",
+]
+
+
+def run_sync(clients, requests):
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+
+    def worker(n):
+        for i in range(n):
+            status, _ = wsgi_post(app, "/graphql", _body(i))
+            assert status.startswith("200"), status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(worker, _split(requests, clients)))
+    return requests / (time.perf_counter() - started)
+
+
+def run_async(clients, requests):
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+
+    async def request(body):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/graphql/async", "raw_path": b"/graphql/async", "query_string": b"",
+            "root_path": "", "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+            "headers": [(b"host", b"localhost"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        }
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        disconnected = asyncio.Event()
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await app(scope, receive, send)
+        disconnected.set()
+        assert statuses == [200], statuses
+
+    async def worker(n):
+        for i in range(n):
+            await request(_body(i))
+
+    async def main():
+        await asyncio.gather(*(worker(n) for n in _split(requests, clients)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return requests / (time.perf_counter() - started)
+
+
+def _body(i):
+    return json.dumps({"query": OPERATIONS[i % len(OPERATIONS)]}).encode()
+
+
+def add_latency(seconds):
+    from django.db.backends.signals import connection_created
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Fired on every reconnect of a thread's (reused) DatabaseWrapper.
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False)
+
+
+def _split(total, parts):
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.conf import settings
+    from django.db import connections
+    from crm.models import Order
+    from benchmarks.generate import generate
+
+    settings.CRM_PROFILE_SAMPLE_RATE = 0
+    if not Order.objects.exists():
+        print(f"Generating {args.orders:,} orders into {args.db} ...")
+        generate(args.customers, args.products, args.orders)
+    connections.close_all()
+    if args.db_latency_ms:
+        add_latency(args.db_latency_ms / 1000)
+
+    print(f"{'clients':>8}{'sync req/s':>14}{'async req/s':>14}")
+    for clients in args.clients:
+        sync_rate = run_sync(clients, args.requests)
+        async_rate = run_async(clients, args.requests)
+        print(f"{clients:>8}{sync_rate:>14.1f}{async_rate:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
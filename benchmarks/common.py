@@ -0,0 +1,62 @@
+import io
+import os
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DB = "/tmp/crm_bench.sqlite3"
+
+
+def setup(db_path=DEFAULT_DB, **database):
+    """
+    Configure Django against a separate SQLite file so benchmarks never touch
+    db.sqlite3, and migrate it. `database` overrides other settings of the
+    default database.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    # No connection has been opened yet, so the new name is picked up.
+    settings.DATABASES["default"].update(database, NAME=db_path)
+    call_command("migrate", verbosity=0)
+
+    # The date filters hand naive dates to DateTimeFields; that is the API's
+    # behaviour and not what is being measured.
+    warnings.filterwarnings("ignore", message=".*received a naive datetime", category=RuntimeWarning)
+
+
+def timed(fn, repeat=5):
+    """Run `fn` `repeat` times and return the median wall time in ms."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def wsgi_post(app, path, body):
+    """POST the JSON `body` (bytes) to `path` through the WSGI `app`; return `(status, content)`."""
+    environ = {
+        "REQUEST_METHOD": "POST", "PATH_INFO": path, "SCRIPT_NAME": "", "QUERY_STRING": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body), "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+    }
+    statuses = []
+    response = app(environ, lambda status, headers: statuses.append(status))
+    try:
+        content = b"".join(response)
+    finally:
+        # Sends request_finished, which closes (or keeps) the connection.
+        getattr(response, "close", lambda: None)()
+    return statuses[0], content
@@ -0,0 +1,92 @@
+"""
+Time and peak memory of the streaming order export against paging through
+allOrders.
+
+    python -m benchmarks.export --page-size 500
+
+Each path reads every order with its customer and product names. Peak
+memory is measured with tracemalloc, so it counts Python allocations only
+and slows every path several-fold.
+Runs against the benchmark SQLite file, seeded with benchmarks.generate
+when empty.
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import DEFAULT_DB, setup
+
+PAGE = """
+query ($first: Int!, $after: String) {
+  allOrders(first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { id orderDate totalAmount customer { name email } products { name } } }
+  }
+}
+"""
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.conf import settings
+    from django.test import Client
+
+    from benchmarks.generate import generate
+    from crm.models import Order
+
+    settings.CRM_PROFILE_SAMPLE_RATE = 0
+    settings.CRM_QUERY_COST = {"MAX_COST": None}
+    if not Order.objects.exists():
+        print(f"Generating {args.orders:,} orders into {args.db} ...")
+        generate(args.customers, args.products, args.orders)
+    client = Client(HTTP_HOST="localhost")
+
+    def paged():
+        rows, after = 0, None
+        while True:
+            response = client.post(
+                "/graphql", {"query": PAGE, "variables": {"first": args.page_size, "after": after}},
+                content_type="application/json",
+            )
+            connection = response.json()["data"]["allOrders"]
+            rows += len(connection["edges"])
+            if not connection["pageInfo"]["hasNextPage"]:
+                return rows
+            after = connection["pageInfo"]["endCursor"]
+
+    def export(export_format):
+        def run():
+            response = client.get("/graphql/export/orders", {"format": export_format})
+            return sum(chunk.count(b"\n") for chunk in response.streaming_content) - (export_format == "csv")
+        return run
+
+    print(f"{'path':<28}{'rows':>10}{'seconds':>10}{'rows/s':>10}{'peak MiB':>10}")
+    for name, fn in [
+        (f"allOrders pages of {args.page_size}", paged),
+        ("export ndjson", export("ndjson")),
+        ("export csv", export("csv")),
+    ]:
+        rows, elapsed, peak = measure(fn)
+        print(f"{name:<28}{rows:>10,}{elapsed:>10.2f}{rows / elapsed:>10,.0f}{peak / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Query plans and timings for the crm.filters filters, with and without the
+indexes added in crm/migrations/0004_filter_indexes.py.
+
+    python -m benchmarks.filter_indexes --orders 2000000
+
+Runs against its own SQLite file, which is seeded on first use.
+"""
+import argparse
+
+from benchmarks.common import DEFAULT_DB, setup, timed
+from benchmarks.generate import generate
+
+PAGE = 50
+
+
+def cases():
+    from crm.filters import CustomerFilter, ProductFilter, OrderFilter
+
+    return [
+        ("orders by date range", OrderFilter,
+         {"order_date_gte": "2025-06-01", "order_date_lte": "2025-06-07"}, ("order_date", "id")),
+        ("orders by total", OrderFilter, {"total_amount_gte": 1900}, ("id",)),
+        ("orders by product", OrderFilter, {"product_id": 7}, ("id",)),
+        ("products by price", ProductFilter, {"price_gte": 495}, ("id",)),
+        ("low-stock products", ProductFilter, {"stock_lte": 2}, ("id",)),
+        ("customers by signup", CustomerFilter,
+         {"created_at_gte": "2025-12-01", "created_at_lte": "2025-12-02"}, ("created_at", "id")),
+        ("customers by phone prefix", CustomerFilter, {"phone_pattern": "+42"}, ("id",)),
+    ]
+
+
+def run(label):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    print(f"\n== {label}")
+    for name, filterset_class, data, ordering in cases():
+        qs = filterset_class(data=data, queryset=filterset_class._meta.model.objects.all()).qs
+        page = qs.order_by(*ordering)[:PAGE]
+        # .all() clones, so every run hits the database.
+        count_ms = timed(lambda: qs.all().count())
+        page_ms = timed(lambda: list(page.all()))
+        print(f"{name:<28} count {count_ms:9.2f} ms   page {page_ms:9.2f} ms")
+        for line in qs.explain().splitlines():
+            print(f"    filter: {line}")
+        for line in page.explain().splitlines():
+            print(f"    page:   {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    setup(args.db)
+
+    from django.core.management import call_command
+    from crm.models import Order
+
+    if not Order.objects.exists():
+        print(f"Seeding {args.orders:,} orders into {args.db} ...")
+        generate(args.customers, args.products, args.orders)
+
+    call_command("migrate", "crm", "0003", verbosity=0)
+    run("without indexes")
+    call_command("migrate", "crm", "0004", verbosity=0)
+    run("with indexes")
+
+
+if __name__ == "__main__":
+    main()
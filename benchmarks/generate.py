@@ -0,0 +1,114 @@
+"""
+Synthetic CRM data at production scale.
+
+    python -m benchmarks.generate --customers 200000 --products 10000 --orders 2000000
+
+Columns are generated as numpy arrays: order customers and product picks
+follow a Zipf-like popularity curve, each order has 1-8 products (Poisson
+fan-out), and totals are the sums of the picked prices. Rows are written
+with raw executemany in chunks, then CrmStats and the revenue rollups are
+rebuilt.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import DEFAULT_DB, setup
+
+CHUNK = 100_000
+START = np.datetime64("2023-01-01T00:00:00")
+SPAN_SECONDS = 3 * 365 * 86400
+
+
+def _popularity(rng, n, size, a=1.2):
+    """Draw `size` ids in 1..n, skewed towards a few popular ones."""
+    ranks = rng.zipf(a, size) - 1
+    ranks = ranks[ranks < n]
+    while len(ranks) < size:
+        extra = rng.zipf(a, size - len(ranks)) - 1
+        ranks = np.concatenate([ranks, extra[extra < n]])
+    # Shuffle which ids are popular so they aren't simply the lowest ones.
+    return rng.permutation(n)[ranks[:size]] + 1
+
+
+def _timestamps(rng, size):
+    seconds = np.sort(rng.integers(0, SPAN_SECONDS, size))
+    # Django stores SQLite datetimes as "YYYY-MM-DD HH:MM:SS".
+    return np.char.replace((START + seconds.astype("timedelta64[s]")).astype(str), "T", " ")
+
+
+def _insert(cursor, sql, columns):
+    size = len(columns[0])
+    for start in range(0, size, CHUNK):
+        cursor.executemany(sql, zip(*(c[start:start + CHUNK].tolist() for c in columns)))
+
+
+def generate(customers, products, orders, seed=42, fanout=2.0):
+    """Insert `customers`, `products` and `orders` synthetic rows."""
+    from django.db import connection, transaction
+    from crm import rollups
+    from crm.stats import rebuild
+
+    rng = np.random.default_rng(seed)
+
+    ids = np.arange(customers)
+    names = np.char.add("Customer ", ids.astype(str))
+    emails = np.char.add(np.char.add("customer", ids.astype(str)), "@example.com")
+    phones = np.char.add("+", rng.integers(10**9, 10**11, customers).astype(str))
+    joined = _timestamps(rng, customers)
+
+    prices = np.round(rng.lognormal(mean=3.5, sigma=1.0, size=products), 2).clip(0.99, 9999.99)
+    stock = rng.integers(0, 500, products)
+    product_names = np.char.add("Product ", np.arange(products).astype(str))
+
+    # Order -> product fan-out, de-duplicated per order.
+    sizes = np.minimum(rng.poisson(fanout - 1, orders) + 1, 8)
+    order_ids = np.repeat(np.arange(1, orders + 1), sizes)
+    picks = _popularity(rng, products, len(order_ids))
+    pairs = np.unique(order_ids.astype(np.int64) * (products + 1) + picks)
+    through_orders, through_products = pairs // (products + 1), pairs % (products + 1)
+    totals = np.zeros(orders + 1)
+    np.add.at(totals, through_orders, prices[through_products - 1])
+
+    order_customers = _popularity(rng, customers, orders, a=1.05)
+    order_dates = _timestamps(rng, orders)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _insert(cursor, "INSERT INTO crm_customer (name, email, phone, created_at) VALUES (%s, %s, %s, %s)",
+                [names, emails, phones, joined])
+        _insert(cursor, "INSERT INTO crm_product (name, price, stock) VALUES (%s, %s, %s)",
+                [product_names, prices, stock])
+        _insert(cursor, "INSERT INTO crm_order (customer_id, total_amount, order_date) VALUES (%s, %s, %s)",
+                [order_customers, np.round(totals[1:], 2), order_dates])
+        _insert(cursor, "INSERT INTO crm_order_products (order_id, product_id) VALUES (%s, %s)",
+                [through_orders, through_products])
+    rebuild()
+    rollups.rebuild()
+    return len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--fanout", type=float, default=2.0, help="Mean products per order.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    setup(args.db)
+    from crm.models import Customer
+
+    if Customer.objects.exists():
+        parser.error(f"{args.db} already has data; pass a fresh --db")
+    started = time.perf_counter()
+    links = generate(args.customers, args.products, args.orders, seed=args.seed, fanout=args.fanout)
+    elapsed = time.perf_counter() - started
+    rows = args.customers + args.products + args.orders + links
+    print(f"Generated {rows:,} rows into {args.db} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+In-process load benchmark for alx_backend_graphql_crm.schema.schema.
+
+    python -m benchmarks.graphql_load --iterations 50 --output bench.json
+    python -m benchmarks.graphql_load --compare bench.json
+
+Each operation is executed directly against the schema (no HTTP) and
+reported with p50/p95/p99 latency, SQL queries per execution and the peak
+Python memory of one execution. Results are written as JSON; --compare
+prints the change against an earlier run. An empty --db is filled with
+benchmarks.generate first.
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.common import DEFAULT_DB, setup
+
+ORDER_FIELDS = "id totalAmount orderDate customer { name email } products { name price }"
+
+OPERATIONS = {
+    "orders_first_page": (
+        f"query {{ allOrders(first: 50) {{ edges {{ node {{ {ORDER_FIELDS} }} }} }} }}", {},
+    ),
+    "orders_deep_page": (
+        f"query ($after: String) {{ allOrders(first: 50, after: $after) {{ edges {{ node {{ {ORDER_FIELDS} }} }} }} }}",
+        {"after": "deep"},
+    ),
+    "orders_by_date_desc": (
+        f"""query {{ allOrders(first: 50, orderBy: ["-orderDate"], orderDateGte: "2025-01-01")
+            {{ totalCount edges {{ node {{ {ORDER_FIELDS} }} }} }} }}""", {},
+    ),
+    "customers_with_orders": (
+        """query { allCustomers(first: 20) { edges { node { name orders { edges { node {
+            totalAmount products { name } } } } } } } }""", {},
+    ),
+    "low_stock_products": (
+        "query { allProducts(first: 100, stockLte: 10) { edges { node { name stock } } } }", {},
+    ),
+    "totals": ("query { totalCustomers totalOrders totalRevenue }", {}),
+}
+
+
+def _execute(query, variables):
+    from django.test import RequestFactory
+    from alx_backend_graphql_crm.schema import schema
+
+    result = schema.execute(query, variable_values=variables, context_value=RequestFactory().post("/graphql"))
+    if result.errors:
+        raise RuntimeError(result.errors[0])
+    return result
+
+
+def _deep_cursor(depth):
+    """An endCursor `depth` rows into allOrders, for measuring deep pages."""
+    from crm.models import Order
+    from crm.pagination import _encode, _keyset_fields, _ordering
+
+    row = Order.objects.order_by("id")[depth:depth + 1].first()
+    if row is None:
+        return None
+    ordering = _ordering(Order, None)
+    return _encode(row, _keyset_fields(Order, ordering), ordering)
+
+
+def measure(name, query, variables, iterations, warmup=3):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        _execute(query, variables)
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        _execute(query, variables)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    # Query counting and tracemalloc both slow execution down, so they get
+    # their own runs outside the timed loop.
+    with CaptureQueriesContext(connection) as queries:
+        _execute(query, variables)
+    tracemalloc.start()
+    _execute(query, variables)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "queries": len(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(current, previous):
+    print(f"\n{'operation':<24}{'p50 ms':>20}{'p95 ms':>20}{'queries':>12}")
+    for name, now in current["operations"].items():
+        before = previous["operations"].get(name)
+        if before is None:
+            continue
+
+        def cell(key):
+            change = (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            return f"{before[key]:.2f}->{now[key]:.2f} ({change:+.0f}%)"
+
+        print(f"{name:<24}{cell('p50_ms'):>20}{cell('p95_ms'):>20}{before['queries']:>5}->{now['queries']:<5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--only", nargs="*", choices=sorted(OPERATIONS), help="Run a subset.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against.")
+    parser.add_argument("--customers", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    setup(args.db)
+    from crm.models import Customer, Product, Order
+    from benchmarks.generate import generate
+
+    if not Order.objects.exists():
+        print(f"Generating {args.orders:,} orders into {args.db} ...")
+        generate(args.customers, args.products, args.orders)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "db": args.db,
+            "customers": Customer.objects.count(),
+            "products": Product.objects.count(),
+            "orders": Order.objects.count(),
+            "iterations": args.iterations,
+        },
+        "operations": {},
+    }
+
+    print(f"{'operation':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KiB':>10}")
+    for name, (query, variables) in OPERATIONS.items():
+        if args.only and name not in args.only:
+            continue
+        if variables.get("after") == "deep":
+            variables = {"after": _deep_cursor(results["meta"]["orders"] // 2)}
+        r = measure(name, query, variables, args.iterations)
+        results["operations"][name] = r
+        print(f"{name:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['queries']:>9}{r['peak_kb']:>10.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Parse + validate time saved by the document cache (crm/documents.py).
+
+    python -m benchmarks.persisted_queries --repeat 200
+
+For the registered operations and the graphql_load operations, prints the
+median time to parse and validate the text, to find it in the cache by
+text and by hash alone, and a whole /graphql request with and without a
+cache hit. Runs against its own SQLite file; it does not need to be seeded.
+"""
+import argparse
+
+from benchmarks.common import DEFAULT_DB, setup, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.conf import settings
+    from django.test import Client
+    from graphql import parse, validate
+
+    from alx_backend_graphql_crm.schema import schema
+    from benchmarks.graphql_load import OPERATIONS
+    from crm.documents import DocumentCache, get_document_cache
+    from crm.operations import KNOWN_OPERATIONS, query_hash
+
+    settings.CRM_PROFILE_SAMPLE_RATE = 0
+    graphql_schema = schema.graphql_schema
+    variables = {"sevenDaysAgo": "2025-01-01"}
+    cases = [(parse(q).definitions[0].name.value, q, variables) for q in KNOWN_OPERATIONS]
+    cases += [(name, q, v) for name, (q, v) in OPERATIONS.items() if "after" not in v]
+
+    client = Client(HTTP_HOST="localhost")
+    view_cache = get_document_cache(graphql_schema)
+
+    print(f"{'operation':<24}{'parse+validate':>16}{'hit by text':>13}{'hit by hash':>13}"
+          f"{'request cold':>14}{'request hit':>13}  (ms)")
+    for name, query, variables in cases:
+        if validate(graphql_schema, parse(query)):
+            print(f"{name:<24}  does not validate, skipped")
+            continue
+        cache = DocumentCache(graphql_schema)
+        cache.register(query)
+        sha256 = query_hash(query)
+
+        cold = timed(lambda: validate(graphql_schema, parse(query)), args.repeat)
+        by_text = timed(lambda: cache.get(query), args.repeat)
+        by_hash = timed(lambda: cache.get(sha256=sha256), args.repeat)
+
+        def request(clear):
+            if clear:
+                view_cache.clear()
+            client.post("/graphql", {"query": query, "variables": variables}, content_type="application/json")
+
+        request_cold = timed(lambda: request(clear=True), args.repeat)
+        request_hit = timed(lambda: request(clear=False), args.repeat)
+        print(f"{name:<24}{cold:>16.3f}{by_text:>13.4f}{by_hash:>13.4f}{request_cold:>14.3f}{request_hit:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Mixed read/write GraphQL throughput with SQLite's default connection
+settings against the project's profile (WAL, pragmas, persistent
+connections).
+
+    python -m benchmarks.sqlite_profile --threads 1 8 32 --requests 1000 --writes 0.2
+
+Threads send requests through the WSGI application, as a threaded WSGI
+server would: `--writes` of them are createOrder mutations, the rest
+connection queries. Each profile runs in its own process, since
+connection settings are read once. Both use BEGIN IMMEDIATE
+transactions. Runs against its own SQLite file, seeded on first use.
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import setup, wsgi_post
+
+PROFILES = {
+    # Django's defaults, with the journal mode (which persists in the
+    # file) set back to the default.
+    "default": {"OPTIONS": {"transaction_mode": "IMMEDIATE", "init_command": "PRAGMA journal_mode=DELETE"},
+                "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    # As configured in settings.
+    "project": None,
+}
+
+READS = [
+    "{ allProducts(first: 20, stockGte: 1) { edges { node { name price stock } } } }",
+    "{ allOrders(first: 10) { edges { node { id totalAmount customer { name } products { name } } } } }",
+    "{ totalCustomers totalOrders totalRevenue }",
+]
+CREATE_ORDER = """
+mutation ($customerId: ID!, $productIds: [ID]!) {
+  createOrder(customerId: $customerId, productIds: $productIds) { order { id } }
+}
+"""
+
+
+def run(threads, requests, writes, customers, products):
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+
+    def worker(args):
+        seed, n = args
+        rng = random.Random(seed)
+        failed = 0
+        for _ in range(n):
+            if rng.random() < writes:
+                variables = {"customerId": rng.choice(customers), "productIds": rng.sample(products, 2)}
+                body = {"query": CREATE_ORDER, "variables": variables}
+            else:
+                body = {"query": rng.choice(READS)}
+            status, content = wsgi_post(app, "/graphql", json.dumps(body).encode())
+            if not status.startswith("200") or b'"errors"' in content:
+                failed += 1
+        return failed
+
+    shares = [(i, requests // threads + (1 if i < requests % threads else 0)) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        failed = sum(pool.map(worker, shares))
+    return requests / (time.perf_counter() - started), failed
+
+
+def run_profile(args):
+    setup(args.db, **(PROFILES[args.profile] or {}))
+    from django.conf import settings
+    from django.db import connections
+    from benchmarks.generate import generate
+    from crm.models import Customer, Product
+
+    settings.CRM_PROFILE_SAMPLE_RATE = 0
+    if not Product.objects.exists():
+        generate(args.customers, args.products, args.orders)
+    Product.objects.update(stock=10**9)
+    customers = list(Customer.objects.values_list("pk", flat=True)[:1000])
+    products = list(Product.objects.values_list("pk", flat=True))
+    connections.close_all()
+
+    for threads in args.threads:
+        rate, failed = run(threads, args.requests, args.writes, customers, products)
+        print(f"{args.profile:<10}{threads:>8}{rate:>10.1f}{100 * failed / args.requests:>10.1f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="/tmp/crm_mixed_bench.sqlite3")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--writes", type=float, default=0.2, help="Share of requests that place an order.")
+    parser.add_argument("--customers", type=int, default=2_000)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        run_profile(args)
+        return
+
+    print(f"{'profile':<10}{'threads':>8}{'req/s':>10}{'failed %':>10}", flush=True)
+    for profile in PROFILES:
+        subprocess.run([sys.executable, "-m", "benchmarks.sqlite_profile", *sys.argv[1:], "--profile", profile],
+                       check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Order throughput and abort rate when many threads order the same few
+products.
+
+    python -m benchmarks.stock_contention --threads 1 8 32 --orders 2000 --stock 1500
+
+Each thread runs the createOrder mutation for one or two of `--hot`
+products, listed in random order. An order aborts when a product is out
+of stock (`short`) or when the database gives up waiting for a lock
+(`failed`). After each round the units taken off stock are checked
+against the order-product rows written, so an oversold product fails
+the run.
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import setup
+
+CREATE_ORDER = """
+mutation ($customerId: ID!, $productIds: [ID]!) {
+  createOrder(customerId: $customerId, productIds: $productIds) { order { id } }
+}
+"""
+
+
+def run(threads, orders, customer, hot):
+    from django.db import connection
+    from django.test import RequestFactory
+
+    from alx_backend_graphql_crm.schema import schema
+
+    def worker(n):
+        outcomes = {"ok": 0, "short": 0, "failed": 0}
+        rng = random.Random(n)
+        try:
+            for _ in range(n):
+                ids = rng.sample(hot, rng.randint(1, min(2, len(hot))))
+                result = schema.execute(
+                    CREATE_ORDER, variable_values={"customerId": customer, "productIds": ids},
+                    context_value=RequestFactory().post("/graphql"),
+                )
+                if not result.errors:
+                    outcomes["ok"] += 1
+                elif "Insufficient stock" in result.errors[0].message:
+                    outcomes["short"] += 1
+                else:
+                    outcomes["failed"] += 1
+        finally:
+            connection.close()
+        return outcomes
+
+    shares = [orders // threads + (1 if i < orders % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - started
+    return {k: sum(r[k] for r in results) for k in results[0]}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="/tmp/crm_stock_bench.sqlite3")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--hot", type=int, default=3, help="Number of products every order draws from.")
+    parser.add_argument("--stock", type=int, default=1_000_000, help="Starting stock of each hot product.")
+    args = parser.parse_args()
+
+    setup(args.db)
+    from django.db import connections
+    from crm.models import Customer, Order, Product
+
+    customer, _ = Customer.objects.get_or_create(email="contention@example.com", defaults={"name": "Contention"})
+    hot = [
+        Product.objects.get_or_create(name=f"Hot {i}", defaults={"price": 10})[0].pk
+        for i in range(args.hot)
+    ]
+    Through = Order.products.through
+
+    print(f"{'threads':>8}{'orders/s':>10}{'ok':>8}{'short %':>9}{'failed %':>10}")
+    for threads in args.threads:
+        Product.objects.filter(pk__in=hot).update(stock=args.stock)
+        before = Through.objects.filter(product_id__in=hot).count()
+        connections.close_all()
+
+        outcomes, elapsed = run(threads, args.orders, customer.pk, hot)
+
+        sold = Through.objects.filter(product_id__in=hot).count() - before
+        left = sum(Product.objects.filter(pk__in=hot).values_list("stock", flat=True))
+        assert args.stock * len(hot) - left == sold, "stock and order lines disagree"
+        total = sum(outcomes.values())
+        print(f"{threads:>8}{outcomes['ok'] / elapsed:>10.1f}{outcomes['ok']:>8}"
+              f"{100 * outcomes['short'] / total:>9.1f}{100 * outcomes['failed'] / total:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Query root and middleware for executing the schema asynchronously under
+ASGI (see AsyncCRMGraphQLView).
+
+The root resolvers below are coroutines on Django's async ORM, so
+independent root fields run concurrently. Every other resolver is sync
+code that may touch the ORM, and it has to run off the event loop, on the
+request's sync thread. AsyncExecutionContext does that per sync root
+field; SyncResolverMiddleware does it per resolver beneath async root
+fields. Plain attribute reads run inline.
+"""
+import asyncio
+import inspect
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from graphene.relay.node import GlobalID
+from graphene.types.resolver import get_default_resolver
+from graphql import ExecutionContext
+
+from .loaders import get_loaders
+from .models import Customer, Product, Order
+from .optimizer import optimize
+from .schema import Query
+from .stats import aget_stats
+
+
+class AsyncQuery(Query):
+    class Meta:
+        name = "Query"
+
+    async def resolve_customers(root, info):
+        return [c async for c in optimize(Customer.objects.all(), info)]
+
+    async def resolve_products(root, info):
+        return [p async for p in optimize(Product.objects.all(), info)]
+
+    async def resolve_orders(root, info):
+        orders = [o async for o in optimize(Order.objects.all(), info)]
+        get_loaders(info).prime_orders(orders)
+        return orders
+
+    async def resolve_total_customers(root, info):
+        return (await _request_stats(info)).customer_count
+
+    async def resolve_total_orders(root, info):
+        return (await _request_stats(info)).order_count
+
+    async def resolve_total_revenue(root, info):
+        return float((await _request_stats(info)).revenue)
+
+
+def _request_stats(info):
+    # The total* fields run concurrently; they share one summary-row read.
+    context = info.context
+    task = getattr(context, "crm_stats_task", None)
+    if task is None:
+        task = asyncio.ensure_future(aget_stats())
+        if context is not None:
+            context.crm_stats_task = task
+    return task
+
+
+class AsyncExecutionContext(ExecutionContext):
+    """
+    Runs each sync root field, with everything beneath it, in one
+    sync_to_async call rather than hopping threads per resolver. Root
+    fields still run concurrently with each other.
+    """
+
+    def execute_field(self, parent_type, source, field_nodes, path):
+        if path.prev is None:
+            field = parent_type.fields.get(field_nodes[0].name.value)
+            if field is not None and not _runs_inline(field.resolve):
+                return sync_to_async(super().execute_field)(parent_type, source, field_nodes, path)
+        return super().execute_field(parent_type, source, field_nodes, path)
+
+
+class SyncResolverMiddleware:
+    """
+    Graphene middleware for the fields beneath async root resolvers: runs
+    sync resolvers that may use the ORM in the sync thread. Native async
+    resolvers, default attribute resolvers and Relay ids run inline.
+    """
+
+    def __init__(self):
+        self._inline = {}
+
+    def resolve(self, next, root, info, **args):
+        if not _on_event_loop():
+            # Already in the sync thread (see AsyncExecutionContext).
+            return next(root, info, **args)
+        key = (info.parent_type.name, info.field_name)
+        inline = self._inline.get(key)
+        if inline is None:
+            inline = self._inline[key] = _runs_inline(info.parent_type.fields[info.field_name].resolve)
+        if inline:
+            return next(root, info, **args)
+        return sync_to_async(_resolve)(next, root, info, args)
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _runs_inline(resolve):
+    if resolve is None or inspect.iscoroutinefunction(resolve):
+        return True
+    return isinstance(resolve, partial) and resolve.func in (get_default_resolver(), GlobalID.id_resolver)
+
+
+def _resolve(next, root, info, args):
+    result = next(root, info, **args)
+    if hasattr(result, "_fetch_all"):
+        # A lazy queryset would otherwise be listed on the event loop.
+        result._fetch_all()
+    return result
@@ -0,0 +1,312 @@
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from . import rollups
+from .models import Customer, Product, Order
+from .response_cache import invalidate
+from .stats import record
+from .validators import order_error, phone_error
+
+BATCH_SIZE = 1000
+RESTOCK_THRESHOLD = 10
+RESTOCK_INCREMENT = 10
+
+
+class InsufficientStock(Exception):
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"Insufficient stock for: {', '.join(names)}")
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def create_customers(rows, batch_size=BATCH_SIZE):
+    """
+    Insert customers from `rows` (objects with name/email/phone attributes)
+    in chunks of `batch_size`, all inside one transaction.
+
+    Each chunk is validated in memory, checked for existing emails with one
+    `email__in` query and written with one `bulk_create`. Returns the
+    created customers and a per-row list of error messages.
+    """
+    created = []
+    errors = []
+    seen = set()
+
+    with transaction.atomic():
+        for chunk in chunked(rows, batch_size):
+            batch, chunk_errors = prepare_customers(chunk, seen)
+            errors += [message for _, message in chunk_errors]
+            created += Customer.objects.bulk_create(batch)
+        # bulk_create sends no post_save signals.
+        record(customers=len(created))
+        invalidate(Customer)
+
+    return created, errors
+
+
+def prepare_customers(chunk, seen, check_phone=False):
+    """
+    Validate one chunk of customer rows. Emails already in the database are
+    found with a single `email__in` query; `seen` holds the emails accepted
+    so far in this import and is updated. Returns the unsaved customers and
+    a list of `(row, message)` errors.
+    """
+    existing = set(
+        Customer.objects.filter(email__in=[r.email for r in chunk])
+        .values_list("email", flat=True)
+    )
+    batch = []
+    errors = []
+    for r in chunk:
+        if r.email in existing or r.email in seen:
+            errors.append((r, f"Email already exists: {r.email}"))
+            continue
+        error = phone_error(r.phone) if check_phone else None
+        if error:
+            errors.append((r, f"{r.email}: {error}"))
+            continue
+        customer = Customer(name=r.name, email=r.email, phone=r.phone or "")
+        try:
+            # Uniqueness is covered by the set lookups above.
+            customer.full_clean(validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            errors.append((r, f"{r.email}: {str(e)}"))
+            continue
+        seen.add(r.email)
+        batch.append(customer)
+    return batch, errors
+
+
+def link_products(pairs):
+    """Insert the through rows for `(order, products)` pairs in one statement."""
+    Through = Order.products.through
+    Through.objects.bulk_create(
+        Through(order_id=order.pk, product_id=product.pk)
+        for order, products in pairs
+        for product in products
+    )
+    invalidate(Order)
+
+
+def delete_customers(ids):
+    """
+    Delete the customers in `ids` with their orders and order-product rows,
+    one DELETE per table rather than Django's in-memory cascade, and adjust
+    the summary row and the revenue rollups. Call inside a transaction; returns
+    `(customers, orders, order_products)` deleted.
+    """
+    if not ids:
+        return 0, 0, 0
+    qn = connection.ops.quote_name
+    Through = Order.products.through
+    customer, order, through = (qn(m._meta.db_table) for m in (Customer, Order, Through))
+    customer_pk, order_pk = qn(Customer._meta.pk.column), qn(Order._meta.pk.column)
+    order_customer = qn(Order._meta.get_field("customer").column)
+    through_order = qn(Through._meta.get_field("order").column)
+    in_ids = "(" + ", ".join(["%s"] * len(ids)) + ")"
+
+    customer_orders = Order.objects.filter(customer_id__in=ids)
+    totals = customer_orders.aggregate(count=Count("pk"), revenue=Sum("total_amount"))
+    rollups.forget(customer_orders)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {through} WHERE {through_order} IN "
+            f"(SELECT {order_pk} FROM {order} WHERE {order_customer} IN {in_ids})",
+            ids,
+        )
+        order_products = cursor.rowcount
+        cursor.execute(f"DELETE FROM {order} WHERE {order_customer} IN {in_ids}", ids)
+        orders = cursor.rowcount
+        cursor.execute(f"DELETE FROM {customer} WHERE {customer_pk} IN {in_ids}", ids)
+        customers = cursor.rowcount
+
+    record(customers=-customers, orders=-orders, revenue=-(totals["revenue"] or 0))
+    # Raw deletes send no signals.
+    invalidate(Customer, Order)
+    return customers, orders, order_products
+
+
+def lock_products(ids):
+    """
+    Lock the products in `ids` with select_for_update, always in
+    primary-key order so concurrent orders can't deadlock, and return them
+    by primary key. Call inside a transaction.
+    """
+    return {p.pk: p for p in Product.objects.select_for_update().filter(pk__in=ids).order_by("pk")}
+
+
+def reserve_stock(quantities, locked=None):
+    """
+    Take `quantities` ({product id: units}) off stock in one UPDATE, guarded
+    by `stock >= units` per product. Pass the products from lock_products()
+    as `locked` if they are already locked. Raises InsufficientStock, with
+    this call's changes rolled back, if any product is short.
+    """
+    quantities = {pk: n for pk, n in quantities.items() if n}
+    if not quantities:
+        return
+    with transaction.atomic():
+        if locked is None:
+            locked = lock_products(quantities)
+        short = [pk for pk, n in quantities.items() if pk not in locked or locked[pk].stock < n]
+        if not short and _take_stock(quantities) != len(quantities):
+            # Stock changed after it was read, which the guard catches where
+            # select_for_update doesn't lock (SQLite).
+            short = list(quantities)
+        if short:
+            names = Product.objects.filter(pk__in=short).order_by("pk").values_list("name", flat=True)
+            raise InsufficientStock(list(names))
+    # update() sends no signals.
+    invalidate(Product)
+
+
+def _take_stock(quantities):
+    units = set(quantities.values())
+    if len(units) == 1:
+        n = units.pop()
+        products = Product.objects.filter(pk__in=quantities, stock__gte=n)
+        amount = Value(n)
+    else:
+        products = Product.objects.filter(reduce(or_, (Q(pk=pk, stock__gte=n) for pk, n in quantities.items())))
+        amount = Case(*(When(pk=pk, then=Value(n)) for pk, n in quantities.items()), output_field=IntegerField())
+    return products.update(stock=F("stock") - amount)
+
+
+def _pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def create_orders(rows, batch_size=BATCH_SIZE):
+    """
+    Insert orders from `rows` (objects with customer_id/product_ids
+    attributes) in chunks of `batch_size`, all inside one transaction.
+
+    Each chunk costs one customer lookup, one locking product lookup, one
+    stock update, one order insert and one through-table insert. Rows are
+    validated with the same rules as `CreateOrder`, and each takes one unit
+    of stock per product; invalid rows and rows the remaining stock can't
+    cover are skipped and reported.
+    """
+    created = []
+    linked = []
+    errors = []
+
+    with transaction.atomic():
+        for i, chunk in enumerate(chunked(rows, batch_size)):
+            customers = Customer.objects.in_bulk({_pk(r.customer_id) for r in chunk} - {None})
+            products = lock_products({_pk(p) for r in chunk for p in r.product_ids or []} - {None})
+
+            pairs = []
+            reserved = Counter()
+            for n, r in enumerate(chunk, start=i * batch_size):
+                customer = customers.get(_pk(r.customer_id))
+                ids = [_pk(p) for p in r.product_ids or []]
+                error = order_error(customer is not None, ids, products)
+                if error:
+                    errors.append(f"Row {n}: {error}")
+                    continue
+                chosen = [products[i] for i in ids]
+                short = [p.name for p in chosen if p.stock - reserved[p.pk] < 1]
+                if short:
+                    errors.append(f"Row {n}: {InsufficientStock(short)}")
+                    continue
+                reserved.update(ids)
+                order = Order(customer=customer, total_amount=sum(p.price for p in chosen))
+                pairs.append((order, chosen))
+
+            reserve_stock(reserved, locked=products)
+            Order.objects.bulk_create([order for order, _ in pairs])
+            link_products(pairs)
+            created += [order for order, _ in pairs]
+            linked += pairs
+        # bulk_create sends no post_save signals.
+        record(orders=len(created), revenue=sum(o.total_amount for o in created))
+        rollups.record(linked)
+
+    return created, errors
+
+
+def restock(threshold=RESTOCK_THRESHOLD, increment=RESTOCK_INCREMENT, batch_size=BATCH_SIZE):
+    """
+    Add `increment` to the stock of every product with less than
+    `threshold`, `batch_size` products at a time in primary-key order, each
+    chunk in its own transaction. Returns the updated products with their
+    new stock, including those now at or above `threshold`.
+
+    Where the database has UPDATE ... RETURNING, a chunk is one statement;
+    otherwise its rows are locked with select_for_update, updated by id and
+    read back.
+    """
+    restock_chunk = _restock_returning if _can_update_returning() else _restock_locked
+    restocked = []
+    last = 0
+    while True:
+        with transaction.atomic():
+            chunk = restock_chunk(threshold, increment, last, batch_size)
+        restocked += chunk
+        # Products still below the threshold are not picked up again.
+        last = chunk[-1].pk if chunk else last
+        # A chunk can come back short although its scan found more: rows
+        # another transaction restocked meanwhile fail the outer stock check.
+        # Only stop once nothing past the chunk is left to restock.
+        if len(chunk) < batch_size and not Product.objects.filter(stock__lt=threshold, pk__gt=last).exists():
+            break
+    if restocked:
+        # update() and raw SQL send no signals.
+        invalidate(Product)
+    return restocked
+
+
+def _can_update_returning():
+    # SQLite gained RETURNING in 3.35, along with INSERT ... RETURNING.
+    return connection.vendor == "postgresql" or (
+        connection.vendor == "sqlite" and connection.features.can_return_columns_from_insert
+    )
+
+
+def _restock_returning(threshold, increment, last, batch_size):
+    qn = connection.ops.quote_name
+    table, pk, stock = qn(Product._meta.db_table), qn(Product._meta.pk.column), qn("stock")
+    columns = ", ".join(qn(f.column) for f in Product._meta.concrete_fields)
+    # The outer stock check is re-evaluated against rows another
+    # transaction changed meanwhile, so a product is never restocked twice.
+    sql = (
+        f"UPDATE {table} SET {stock} = {stock} + %s "
+        f"WHERE {stock} < %s AND {pk} IN ("
+        f"SELECT {pk} FROM {table} WHERE {stock} < %s AND {pk} > %s ORDER BY {pk} LIMIT %s"
+        f") RETURNING {columns}"
+    )
+    products = Product.objects.raw(sql, [increment, threshold, threshold, last, batch_size])
+    return sorted(products, key=lambda p: p.pk)
+
+
+def _restock_locked(threshold, increment, last, batch_size):
+    ids = list(
+        Product.objects.select_for_update()
+        .filter(stock__lt=threshold, pk__gt=last)
+        .order_by("pk")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    Product.objects.filter(pk__in=ids).update(stock=F("stock") + increment)
+    return list(Product.objects.filter(pk__in=ids).order_by("pk"))
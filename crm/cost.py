@@ -0,0 +1,182 @@
+"""
+Static cost and depth limits for GraphQL operations.
+
+The cost of an operation is the sum over its fields of
+`weight x multiplier`. The multiplier is the product of the page sizes of
+the lists and connections the field sits inside. A connection's page size
+is its `first`/`last` argument (variables included), or
+RELAY_CONNECTION_MAX_LIMIT when it has neither. A plain list uses SIZES,
+else DEFAULT_LIST_SIZE.
+
+Object fields weigh 1. Scalars and the connection plumbing (edges, node,
+pageInfo) weigh 0. WEIGHTS overrides either by "Type.field" or "*.field".
+Depth counts nested object fields, again ignoring the plumbing.
+
+The limits come from the CRM_QUERY_COST setting and are checked by
+QueryCostRule, a validation rule that runs per request (it needs the
+variables), before anything executes.
+"""
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode, FragmentSpreadNode, GraphQLError, IntValueNode, VariableNode,
+    get_named_type, get_nullable_type, is_composite_type, is_list_type, validate,
+)
+from graphql.validation import ValidationRule
+
+DEFAULTS = {
+    "MAX_COST": 10_000,
+    "MAX_DEPTH": 10,
+    "DEFAULT_LIST_SIZE": 100,
+    "SIZES": {},
+    "WEIGHTS": {},
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "CRM_QUERY_COST", {})}
+
+
+class QueryCostRule(ValidationRule):
+    """
+    Rejects operations over MAX_COST or MAX_DEPTH. Build one per request
+    with `for_request()` so page-size variables are known.
+    """
+
+    variables = None
+    config = DEFAULTS
+    result = None
+
+    def __init__(self, context):
+        super().__init__(context)
+        # (fragment name, page size) -> (cost, depth) at multiplier 1, depth 0.
+        self.fragment_costs = {}
+
+    @classmethod
+    def for_request(cls, variables, config, result):
+        """`result` (a dict) receives the cost and depth of the costliest operation."""
+        return type(cls.__name__, (cls,), {"variables": variables or {}, "config": config, "result": result})
+
+    def enter_operation_definition(self, node, *_):
+        root = self.context.schema.get_root_type(node.operation)
+        if root is None:
+            return
+        cost, depth = self.measure(root, node.selection_set, 1, 0, set())
+        if self.result is not None and cost >= self.result.get("cost", -1):
+            self.result.update(cost=cost, depth=depth)
+
+        max_cost, max_depth = self.config["MAX_COST"], self.config["MAX_DEPTH"]
+        if max_cost is not None and cost > max_cost:
+            self.report_error(GraphQLError(
+                f"Query cost {cost} exceeds the maximum of {max_cost}.",
+                node, extensions={"code": "QUERY_TOO_COSTLY", "cost": cost, "maxCost": max_cost},
+            ))
+        if max_depth is not None and depth > max_depth:
+            self.report_error(GraphQLError(
+                f"Query depth {depth} exceeds the maximum of {max_depth}.",
+                node, extensions={"code": "QUERY_TOO_DEEP", "depth": depth, "maxDepth": max_depth},
+            ))
+
+    def measure(self, parent_type, selection_set, multiplier, depth, fragments, page=1):
+        """
+        Return `(cost, depth)` of `selection_set` on `parent_type`. `page` is
+        the page size of a connection, which multiplies its edges but not
+        fields of its own such as totalCount.
+        """
+        cost, deepest = 0, depth
+        plumbing = _is_plumbing(parent_type)
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field = getattr(parent_type, "fields", {}).get(selection.name.value)
+                if field is None:
+                    continue  # __typename and friends
+                coordinate = f"{parent_type.name}.{selection.name.value}"
+                named = get_named_type(field.type)
+                composite = is_composite_type(named)
+                cost += self.weight(coordinate, selection.name.value, composite and not plumbing) * multiplier
+                if selection.selection_set is not None and composite:
+                    if plumbing:
+                        size, sub_page = (page if selection.name.value == "edges" else 1), 1
+                    else:
+                        size, sub_page = self.size(coordinate, field, selection), 1
+                        if _is_plumbing(named):
+                            size, sub_page = 1, size
+                    sub_cost, sub_depth = self.measure(
+                        named, selection.selection_set, multiplier * size,
+                        depth if plumbing else depth + 1, fragments, sub_page,
+                    )
+                    cost += sub_cost
+                    deepest = max(deepest, sub_depth)
+                continue
+
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                if fragment is None or name in fragments:
+                    continue
+                # Cost is linear in the multiplier, so each fragment is
+                # measured once per page size however often it is spread.
+                key = (name, page)
+                if key not in self.fragment_costs:
+                    self.fragment_costs[key] = self.measure(
+                        self._condition_type(fragment, parent_type), fragment.selection_set,
+                        1, 0, fragments | {name}, page,
+                    )
+                sub_cost, sub_depth = self.fragment_costs[key]
+                cost += sub_cost * multiplier
+                deepest = max(deepest, depth + sub_depth)
+                continue
+
+            sub_cost, sub_depth = self.measure(
+                self._condition_type(selection, parent_type), selection.selection_set,
+                multiplier, depth, fragments, page,
+            )
+            cost += sub_cost
+            deepest = max(deepest, sub_depth)
+        return cost, deepest
+
+    def _condition_type(self, fragment, parent_type):
+        type_condition = fragment.type_condition
+        return self.context.schema.get_type(type_condition.name.value) if type_condition else parent_type
+
+    def weight(self, coordinate, name, default):
+        weights = self.config["WEIGHTS"]
+        if coordinate in weights:
+            return weights[coordinate]
+        return weights.get(f"*.{name}", 1 if default else 0)
+
+    def size(self, coordinate, field, node):
+        if "first" in field.args or "last" in field.args:
+            sizes = [self.argument(node, name) for name in ("first", "last")]
+            sizes = [s for s in sizes if s is not None]
+            max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+            size = min(sizes) if sizes else max_limit
+            return min(size, max_limit) if max_limit else size
+        if is_list_type(get_nullable_type(field.type)):
+            return self.config["SIZES"].get(coordinate, self.config["DEFAULT_LIST_SIZE"])
+        return 1
+
+    def argument(self, node, name):
+        for argument in node.arguments:
+            if argument.name.value == name:
+                value = argument.value
+                if isinstance(value, VariableNode):
+                    value = self.variables.get(value.name.value)
+                    return value if isinstance(value, int) else None
+                if isinstance(value, IntValueNode):
+                    return int(value.value)
+        return None
+
+
+def _is_plumbing(graphql_type):
+    # Relay connection and edge types only wrap the nodes they hold.
+    fields = getattr(graphql_type, "fields", None) or {}
+    return ("edges" in fields and "pageInfo" in fields) or ("node" in fields and "cursor" in fields)
+
+
+def check_cost(schema, document, variables, config=None):
+    """Return `(result, errors)` with the cost and depth of `document` and any limit errors."""
+    result = {}
+    rule = QueryCostRule.for_request(variables, config or get_config(), result)
+    errors = validate(schema, document, [rule])
+    return result, errors
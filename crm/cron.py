@@ -1,35 +1,27 @@
 import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport, TransportQueryError
+
+from crm.operations import HEARTBEAT, RESTOCK_LOW_STOCK, GraphQLRequestError, run_operation
 
 def log_crm_heartbeat():
     """
     A cron job function managed by django-crontab.
-    It logs a heartbeat message and optionally checks the GraphQL endpoint.
+    It logs a heartbeat message and checks that GraphQL answers (in-process,
+    or over HTTP when CRM_GRAPHQL_URL is set; see crm/operations.py).
     """
     # --- Basic Heartbeat Logging ---
     timestamp = datetime.datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
     log_file_path = "/tmp/crm_heartbeat_log.txt"
     heartbeat_message = f"{timestamp} CRM is alive"
 
-    # --- Optional: GraphQL Health Check ---
-    graphql_endpoint_url = "http://localhost:8000/graphql" # Adjust if your URL is different
-    
+    # --- GraphQL Health Check ---
     try:
-        # Set up a simple GQL client
-        transport = RequestsHTTPTransport(url=graphql_endpoint_url, retries=2)
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        
-        # A simple query to test if the endpoint is responsive.
-        # Assuming you have a 'hello' or similar test field in your schema.
-        # If not, you can query for something simple like '__typename'.
-        test_query = gql("{ __typename }")
-        client.execute(test_query)
+        # A simple query to test if GraphQL is responsive.
+        run_operation(HEARTBEAT)
         
         # If the query succeeds, append a success message.
         graphql_status = "GraphQL endpoint is responsive."
 
-    except TransportQueryError as e:
+    except GraphQLRequestError as e:
         # Handle cases where the server returns a GraphQL error (e.g., syntax error)
         graphql_status = f"GraphQL endpoint returned an error: {e}"
     except Exception as e:
@@ -50,29 +42,11 @@ def update_low_stock():
     Executes the UpdateLowStockProducts mutation and logs the results.
     """
     log_file_path = "/tmp/low_stock_updates_log.txt"
-    graphql_endpoint_url = "http://localhost:8000/graphql"
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # Define the mutation query to be sent
-    mutation_query = gql("""
-        mutation RestockLowStock {
-          updateLowStockProducts {
-            message
-            updatedProducts {
-              name
-              stock
-            }
-          }
-        }
-    """)
-
     try:
-        # Set up the GraphQL client
-        transport = RequestsHTTPTransport(url=graphql_endpoint_url, retries=3)
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-
-        # Execute the mutation
-        result = client.execute(mutation_query)
+        # Execute the mutation (RESTOCK_LOW_STOCK in crm/operations.py)
+        result = run_operation(RESTOCK_LOW_STOCK)
         
         # Process and log the result
         with open(log_file_path, "a") as log_file:
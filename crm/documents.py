@@ -0,0 +1,111 @@
+"""
+Parsed and validated GraphQL documents, cached by the SHA-256 of their text.
+
+Parsing and validating a document costs more than executing many of our
+queries, and most traffic repeats a handful of documents. The cache keeps
+the last `CRM_DOCUMENT_CACHE_SIZE` documents that passed validation; plain
+query text is looked up by its hash as well, so every request benefits.
+
+Clients may also send only the hash, as Apollo-style persisted queries:
+
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "..."}}}
+
+A hash that isn't cached or registered gets a PERSISTED_QUERY_NOT_FOUND
+error, and the client retries with the text. The documents in
+crm.operations are registered up front and never need the text.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import GraphQLError, parse, validate
+
+from .operations import KNOWN_OPERATIONS, PERSISTED_QUERY_NOT_FOUND, query_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 256
+
+
+class DocumentCache:
+    def __init__(self, schema, size=DEFAULT_SIZE, rules=None):
+        self.schema = schema
+        self.size = size
+        self.rules = rules
+        # Registered texts are kept for good, so their hashes always resolve.
+        self.registered = {}
+        self.hits = self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, query):
+        """Accept `query` by its hash from now on. Returns (hash, validation errors)."""
+        key = query_hash(query)
+        self.registered[key] = query
+        return key, self.get(query, key)[1]
+
+    def get(self, query=None, sha256=None):
+        """
+        Return `(document, errors)` for `query`, or for the document known
+        as `sha256` when only the hash is given.
+        """
+        key = query_hash(query) if query else sha256
+        if sha256 and key != sha256:
+            return None, [GraphQLError(
+                "provided sha does not match query",
+                extensions={"code": "PERSISTED_QUERY_HASH_MISMATCH"},
+            )]
+
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return document, []
+            self.misses += 1
+
+        query = query or self.registered.get(key)
+        if query is None:
+            return None, [GraphQLError(
+                "PersistedQueryNotFound", extensions={"code": PERSISTED_QUERY_NOT_FOUND}
+            )]
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return None, [e]
+        errors = validate(self.schema, document, self.rules, graphene_settings.MAX_VALIDATION_ERRORS)
+        if errors:
+            return None, errors
+
+        with self._lock:
+            self._documents[key] = document
+            if len(self._documents) > self.size:
+                self._documents.popitem(last=False)
+        return document, []
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.hits = self.misses = 0
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_document_cache(schema, rules=None):
+    """The DocumentCache for a GraphQLSchema, with KNOWN_OPERATIONS registered."""
+    key = (schema, tuple(rules or ()))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = DocumentCache(
+                schema, getattr(settings, "CRM_DOCUMENT_CACHE_SIZE", DEFAULT_SIZE), rules
+            )
+            for query in KNOWN_OPERATIONS:
+                _, errors = cache.register(query)
+                if errors:
+                    logger.warning("Registered operation does not validate: %s", errors[0].message)
+    return cache
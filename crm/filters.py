@@ -1,17 +1,36 @@
+import sys
+
 import django_filters
 from .models import Customer, Product, Order
+from .search import contains, ranked
+
+# name/email filters are substring matches answered by the trigram search
+# indexes; `search` matches every term and orders by relevance (crm.search).
 
 
 class CustomerFilter(django_filters.FilterSet):
-    name_icontains = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
-    email_icontains = django_filters.CharFilter(field_name="email", lookup_expr="icontains")
+    name_icontains = django_filters.CharFilter(field_name="name", method=contains)
+    email_icontains = django_filters.CharFilter(field_name="email", method=contains)
     created_at_gte = django_filters.DateFilter(field_name="created_at", lookup_expr="gte")
     created_at_lte = django_filters.DateFilter(field_name="created_at", lookup_expr="lte")
     phone_pattern = django_filters.CharFilter(method="filter_phone_pattern")
+    search = django_filters.CharFilter(method="filter_search")
 
     def filter_phone_pattern(self, queryset, name, value):
         # Custom: e.g., startswith +1
-        return queryset.filter(phone__startswith=value)
+        # Written as a range rather than startswith (LIKE 'x%') so it can use
+        # the phone index.
+        if not value:
+            return queryset
+        last = ord(value[-1]) + 1
+        if 0xD800 <= last < 0xE000:
+            last = 0xE000  # surrogates can't be stored; nothing sorts between
+        if last > sys.maxunicode:
+            return queryset.filter(phone__startswith=value)
+        return queryset.filter(phone__gte=value, phone__lt=value[:-1] + chr(last))
+
+    def filter_search(self, queryset, name, value):
+        return ranked(queryset, value)
 
     class Meta:
         model = Customer
@@ -19,11 +38,15 @@ class CustomerFilter(django_filters.FilterSet):
 
 
 class ProductFilter(django_filters.FilterSet):
-    name_icontains = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+    name_icontains = django_filters.CharFilter(field_name="name", method=contains)
     price_gte = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
     price_lte = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
     stock_gte = django_filters.NumberFilter(field_name="stock", lookup_expr="gte")
     stock_lte = django_filters.NumberFilter(field_name="stock", lookup_expr="lte")
+    search = django_filters.CharFilter(method="filter_search")
+
+    def filter_search(self, queryset, name, value):
+        return ranked(queryset, value)
 
     class Meta:
         model = Product
@@ -35,8 +58,8 @@ class OrderFilter(django_filters.FilterSet):
     total_amount_lte = django_filters.NumberFilter(field_name="total_amount", lookup_expr="lte")
     order_date_gte = django_filters.DateFilter(field_name="order_date", lookup_expr="gte")
     order_date_lte = django_filters.DateFilter(field_name="order_date", lookup_expr="lte")
-    customer_name = django_filters.CharFilter(field_name="customer__name", lookup_expr="icontains")
-    product_name = django_filters.CharFilter(field_name="products__name", lookup_expr="icontains")
+    customer_name = django_filters.CharFilter(field_name="customer__name", method=contains)
+    product_name = django_filters.CharFilter(field_name="products__name", method=contains)
     product_id = django_filters.NumberFilter(field_name="products__id", lookup_expr="exact")
 
     class Meta:
@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from .models import Customer, Order
+
+
+class DataLoader:
+    """
+    A small synchronous DataLoader.
+
+    Keys are queued with `prime_keys()` while the parent list is being
+    resolved; the first `load()` that misses the cache then fetches every
+    queued key in a single `batch_load()` call. Results are cached for the
+    lifetime of the loader, which is one GraphQL request.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._queue = set()
+
+    def batch_load(self, keys):
+        """Return a dict mapping each key in `keys` to its value."""
+        raise NotImplementedError
+
+    def default(self, key):
+        return None
+
+    def prime(self, key, value):
+        self._cache.setdefault(key, value)
+
+    def prime_keys(self, keys):
+        self._queue.update(k for k in keys if k not in self._cache)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._queue.add(key)
+            self._dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        return [self.load(k) for k in keys]
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, set()
+        results = self.batch_load(keys)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default(key))
+
+
+class CustomerByIdLoader(DataLoader):
+    def batch_load(self, keys):
+        return Customer.objects.in_bulk(keys)
+
+
+class ProductsByOrderLoader(DataLoader):
+    def batch_load(self, keys):
+        products = defaultdict(list)
+        rows = (
+            Order.products.through.objects
+            .filter(order_id__in=keys)
+            .select_related("product")
+            .order_by("order_id", "product_id")
+        )
+        for row in rows:
+            products[row.order_id].append(row.product)
+        return products
+
+    def default(self, key):
+        return []
+
+
+class Loaders:
+    """The set of loaders shared by every resolver of one request."""
+
+    def __init__(self):
+        self.customer_by_id = CustomerByIdLoader()
+        self.products_by_order = ProductsByOrderLoader()
+
+    def prime_orders(self, orders):
+        """Queue the related keys of a page of orders for batched loading."""
+        orders = list(orders)
+        # customer_id is deferred when the client didn't select the customer;
+        # reading it would fetch each row again.
+        self.customer_by_id.prime_keys(
+            o.customer_id for o in orders if "customer_id" not in o.get_deferred_fields()
+        )
+        self.products_by_order.prime_keys(o.pk for o in orders)
+
+
+def get_loaders(info):
+    """
+    Return the loaders attached to the request context, creating them on
+    first use. Without a context nothing can be shared, so a fresh set is
+    returned.
+    """
+    context = info.context
+    if context is None:
+        return Loaders()
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        context.loaders = loaders
+    return loaders
@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from crm import bulk
+from crm.models import Customer, Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete customers with no order since the cutoff (and who signed up "
+        "before it), with their orders, in chunks of customer ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365,
+                            help="Customers without an order in this many days are inactive.")
+        parser.add_argument("--batch-size", type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Count what would be deleted without deleting it.")
+
+    def handle(self, *args, **options):
+        days, batch_size = options["days"], options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size must be positive")
+        cutoff = timezone.now() - timedelta(days=days)
+        inactive = inactive_customers(cutoff)
+
+        if options["dry_run"]:
+            customers = inactive.count()
+            orders = Order.objects.filter(customer__in=inactive).count()
+            self.stdout.write(f"Would delete {customers} inactive customers and {orders} orders.")
+            return
+
+        started = time.monotonic()
+        customers = orders = order_products = 0
+        last = 0
+        while True:
+            with transaction.atomic():
+                # Locked, so an order placed meanwhile waits or keeps its customer.
+                ids = list(
+                    inactive.select_for_update().filter(pk__gt=last)
+                    .order_by("pk").values_list("pk", flat=True)[:batch_size]
+                )
+                deleted = bulk.delete_customers(ids)
+            customers += deleted[0]
+            orders += deleted[1]
+            order_products += deleted[2]
+            if len(ids) < batch_size:
+                break
+            last = ids[-1]
+
+        elapsed = time.monotonic() - started
+        rows = customers + orders + order_products
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {customers} inactive customers, {orders} orders and {order_products} "
+            f"order products in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)."
+        ))
+
+
+def inactive_customers(cutoff):
+    """Customers created before `cutoff` with no order on or after it (one anti-join)."""
+    recent = Order.objects.filter(customer=OuterRef("pk"), order_date__gte=cutoff)
+    return Customer.objects.filter(created_at__lt=cutoff).filter(~Exists(recent))
@@ -0,0 +1,204 @@
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from crm import bulk, rollups
+from crm.models import Customer, Product, Order
+from crm.response_cache import invalidate
+from crm.stats import record
+from crm.validators import order_error, product_error
+
+PROGRESS_EVERY = 10  # seconds
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream customers, products or orders from a CSV or JSONL file into the "
+        "database in chunked bulk inserts. Columns: customers name,email,phone; "
+        "products name,price,stock; orders customer_email,product_ids (ids "
+        "separated by ';' in CSV, a list in JSONL). Orders leave stock alone "
+        "unless --reserve-stock is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=["customers", "products", "orders"])
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=bulk.BATCH_SIZE)
+        parser.add_argument("--reserve-stock", action="store_true",
+                            help="Orders: take one unit of stock per product, as createOrder "
+                                 "does, and reject orders the stock can't cover. Leave it off "
+                                 "for historical orders.")
+
+    def handle(self, *args, **options):
+        kind, path, batch_size = options["kind"], options["path"], options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size must be positive")
+        format = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+
+        importer = {
+            "customers": self.import_customers,
+            "products": self.import_products,
+            "orders": self.import_orders,
+        }[kind]
+
+        self.reserve_stock = options["reserve_stock"]
+        self.started = self.last_report = time.monotonic()
+        self.read = self.written = self.rejected = 0
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        with stream:
+            for chunk in bulk.chunked(read_records(stream, format), batch_size):
+                self.read += len(chunk)
+                records = []
+                for line, r in chunk:
+                    if isinstance(r, InvalidRecord):
+                        self.reject(line, str(r))
+                    else:
+                        records.append((line, r))
+                with transaction.atomic():
+                    self.written += importer(records)
+                self.report_progress()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.written} {kind}, rejected {self.rejected}, "
+            f"{self.read} rows in {elapsed:.1f}s ({self.read / max(elapsed, 1e-9):,.0f} rows/s)."
+        ))
+
+    # ------------------------------------------------------------------
+    # Per-kind chunk writers. Each gets a list of (line, record) pairs and
+    # returns the number of rows written.
+    # ------------------------------------------------------------------
+    def import_customers(self, chunk):
+        rows = []
+        for line, r in chunk:
+            if not r.get("email") or not r.get("name"):
+                self.reject(line, "name and email are required")
+                continue
+            rows.append(SimpleNamespace(line=line, name=r["name"], email=r["email"], phone=r.get("phone") or None))
+        # Earlier chunks are committed, so the email__in query sees them;
+        # only duplicates inside this chunk need remembering.
+        customers, errors = bulk.prepare_customers(rows, seen=set(), check_phone=True)
+        for row, message in errors:
+            self.reject(row.line, message)
+        Customer.objects.bulk_create(customers)
+        record(customers=len(customers))
+        invalidate(Customer)
+        return len(customers)
+
+    def import_products(self, chunk):
+        products = []
+        for line, r in chunk:
+            try:
+                price = Decimal(str(r["price"]))
+                stock = int(r.get("stock") or 0)
+                if not price.is_finite():
+                    raise ValueError
+            except (KeyError, InvalidOperation, OverflowError, TypeError, ValueError):
+                self.reject(line, "price and stock must be numbers")
+                continue
+            error = product_error(price, stock) if r.get("name") else "name is required"
+            if error:
+                self.reject(line, error)
+                continue
+            products.append(Product(name=r["name"], price=price, stock=stock))
+        Product.objects.bulk_create(products)
+        invalidate(Product)
+        return len(products)
+
+    def import_orders(self, chunk):
+        if not hasattr(self, "customer_ids"):
+            # Foreign keys are resolved in memory, loaded once per run.
+            self.customer_ids = dict(Customer.objects.values_list("email", "id").iterator())
+            if not self.reserve_stock:
+                self.products = {p.pk: p for p in Product.objects.only("price").iterator()}
+
+        rows = []
+        for line, r in chunk:
+            try:
+                product_ids = parse_ids(r.get("product_ids"))
+            except (TypeError, ValueError):
+                self.reject(line, "One or more product IDs are invalid")
+                continue
+            rows.append((line, self.customer_ids.get(r.get("customer_email")), product_ids))
+
+        if self.reserve_stock:
+            # Each order takes a unit of stock per product, as in bulk.create_orders.
+            products = bulk.lock_products({p for _, _, ids in rows for p in ids})
+        else:
+            products = self.products
+        pairs = []
+        reserved = Counter()
+        for line, customer_id, product_ids in rows:
+            error = order_error(customer_id is not None, product_ids, products)
+            if error:
+                self.reject(line, error)
+                continue
+            chosen = [products[p] for p in product_ids]
+            if self.reserve_stock:
+                short = [p.name for p in chosen if p.stock - reserved[p.pk] < 1]
+                if short:
+                    self.reject(line, str(bulk.InsufficientStock(short)))
+                    continue
+                reserved.update(product_ids)
+            order = Order(customer_id=customer_id, total_amount=sum(p.price for p in chosen))
+            pairs.append((order, chosen))
+
+        if self.reserve_stock:
+            bulk.reserve_stock(reserved, locked=products)
+        orders = Order.objects.bulk_create([order for order, _ in pairs])
+        bulk.link_products(pairs)
+        record(orders=len(orders), revenue=sum(o.total_amount for o in orders))
+        rollups.record(pairs)
+        return len(orders)
+
+    def reject(self, line, message):
+        self.rejected += 1
+        self.stderr.write(f"line {line}: {message}")
+
+    def report_progress(self):
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_EVERY:
+            self.last_report = now
+            rate = self.read / (now - self.started)
+            self.stdout.write(f"{self.read:,} rows read, {self.written:,} written ({rate:,.0f} rows/s)")
+
+
+class InvalidRecord(ValueError):
+    """Stands in for a line read_records() couldn't read as a record."""
+
+
+def read_records(stream, format):
+    """
+    Yield `(line number, dict)` for every record in `stream`, lazily, or
+    `(line number, InvalidRecord)` for a line that isn't one.
+    """
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    record = json.loads(text)
+                except json.JSONDecodeError as e:
+                    record = InvalidRecord(f"invalid JSON ({e})")
+                if not isinstance(record, (dict, InvalidRecord)):
+                    record = InvalidRecord("each line must be a JSON object")
+                yield line, record
+
+
+def parse_ids(value):
+    if isinstance(value, str):
+        value = [v for v in value.replace(",", ";").split(";") if v.strip()]
+    return [int(v) for v in value or []]
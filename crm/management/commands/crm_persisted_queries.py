@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from graphql import parse
+
+from alx_backend_graphql_crm.schema import schema
+from crm.documents import DocumentCache
+from crm.operations import KNOWN_OPERATIONS
+
+
+class Command(BaseCommand):
+    help = (
+        "List the registered persisted queries (crm.operations.KNOWN_OPERATIONS) "
+        "with their SHA-256 hashes, and fail if any of them does not validate."
+    )
+
+    def handle(self, *args, **options):
+        cache = DocumentCache(schema.graphql_schema)
+        failed = 0
+        for query in KNOWN_OPERATIONS:
+            name = parse(query).definitions[0].name
+            key, errors = cache.register(query)
+            self.stdout.write(f"{key}  {name.value if name else '(anonymous)'}")
+            for error in errors:
+                failed += 1
+                self.stderr.write(f"    {error.message}")
+        if failed:
+            raise CommandError(f"{failed} validation error(s) in registered operations")
+        self.stdout.write(self.style.SUCCESS(f"{len(KNOWN_OPERATIONS)} operations registered."))
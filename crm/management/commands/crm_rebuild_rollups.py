@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from crm.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily revenue rollups from the Order table."
+
+    def handle(self, *args, **options):
+        days, product_days = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Revenue rollups rebuilt: {days} days, {product_days} product-days."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from crm.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CrmStats summary row from the Customer and Order tables."
+
+    def handle(self, *args, **options):
+        stats = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"CRM stats rebuilt: {stats}"))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_stats(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    Order = apps.get_model('crm', 'Order')
+    CrmStats = apps.get_model('crm', 'CrmStats')
+    aggregate = Order.objects.aggregate(count=Count('pk'), revenue=Sum('total_amount'))
+    CrmStats.objects.update_or_create(pk=1, defaults={
+        'customer_count': Customer.objects.count(),
+        'order_count': aggregate['count'],
+        'revenue': aggregate['revenue'] or 0,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0002_customer_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrmStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_count', models.BigIntegerField(default=0)),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'CRM stats',
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import crm.models
+
+# Trigram FTS5 indexes over the searched columns, reading their text from
+# the tables themselves (external content). Triggers keep them in sync with
+# every write, including bulk_create(), update() and raw SQL; stock and
+# price updates don't touch them. A later migration that rebuilds
+# crm_customer or crm_product on SQLite drops the triggers with the table,
+# so it has to run these statements again.
+SEARCH_TABLES = {
+    'crm_customer_search': ('crm_customer', ['name', 'email']),
+    'crm_product_search': ('crm_product', ['name']),
+}
+
+
+def _statements(table, content, columns):
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    insert = f'INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new});'
+    delete = f"INSERT INTO {table}({table}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    return [
+        f"CREATE VIRTUAL TABLE {table} USING fts5({names}, content='{content}', content_rowid='id', "
+        f"tokenize='trigram')",
+        f'CREATE TRIGGER {table}_insert AFTER INSERT ON {content} BEGIN {insert} END',
+        f'CREATE TRIGGER {table}_delete AFTER DELETE ON {content} BEGIN {delete} END',
+        f'CREATE TRIGGER {table}_update AFTER UPDATE OF id, {names} ON {content} BEGIN {delete} {insert} END',
+        # Index the rows already there.
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def create_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, (content, columns) in SEARCH_TABLES.items():
+        for statement in _statements(table, content, columns):
+            schema_editor.execute(statement)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_TABLES:
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_{trigger}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearch',
+            fields=[
+                ('customer', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='crm.customer')),
+                ('document', crm.models.SearchDocument(db_column='crm_customer_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'crm_customer_search',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSearch',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='crm.product')),
+                ('document', crm.models.SearchDocument(db_column='crm_product_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'crm_product_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    Order = apps.get_model('crm', 'Order')
+    DailyRevenue = apps.get_model('crm', 'DailyRevenue')
+    DailyProductRevenue = apps.get_model('crm', 'DailyProductRevenue')
+    Through = Order.products.through
+    days = (
+        Order.objects.annotate(day=TruncDate('order_date')).values('day')
+        .annotate(count=Count('pk'), revenue=Sum('total_amount')).order_by()
+    )
+    DailyRevenue.objects.bulk_create(
+        DailyRevenue(day=d['day'], order_count=d['count'], revenue=d['revenue'] or 0) for d in days.iterator()
+    )
+    products = (
+        Through.objects.annotate(day=TruncDate('order__order_date')).values('day', 'product_id')
+        .annotate(count=Count('pk'), revenue=Sum(F('product__price'))).order_by()
+    )
+    DailyProductRevenue.objects.bulk_create(
+        (DailyProductRevenue(day=p['day'], product_id=p['product_id'], order_count=p['count'], revenue=p['revenue'])
+         for p in products.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'daily revenue',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='crm.product')),
+            ],
+            options={
+                'verbose_name_plural': 'daily product revenue',
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='crm_daily_product_revenue_unique')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
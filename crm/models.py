@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Lookup
 from django.core.validators import MinValueValidator
 
 class Customer(models.Model):
@@ -7,6 +10,13 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)  
 
+    class Meta:
+        indexes = [
+            # CustomerFilter: created_at_gte/lte, phone_pattern (prefix match)
+            models.Index(fields=["created_at", "id"], name="crm_customer_created_id_idx"),
+            models.Index(fields=["phone"], name="crm_customer_phone_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -16,6 +26,13 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.01)])
     stock = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # ProductFilter: price_gte/lte, stock_gte/lte and the low-stock sweep
+            models.Index(fields=["price"], name="crm_product_price_idx"),
+            models.Index(fields=["stock"], name="crm_product_stock_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} (${self.price})"
 
@@ -26,10 +43,125 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
     order_date = models.DateTimeField(auto_now_add=True)
 
-    def save(self, *args, **kwargs):
-        # Ensure total is recalculated each save
-        self.total_amount = sum(p.price for p in self.products.all()) if self.pk else 0
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            # OrderFilter: order_date_gte/lte, with id as the keyset tie-breaker
+            models.Index(fields=["order_date", "id"], name="crm_order_date_id_idx"),
+            models.Index(fields=["total_amount"], name="crm_order_total_idx"),
+        ]
+
+    def recalculate_total(self):
+        # Totals are set when the order is created; call this after changing
+        # the products of an existing order.
+        from .rollups import record_revenue
+        from .stats import record
+
+        previous = self.total_amount
+        total = self.products.aggregate(total=models.Sum("price"))["total"]
+        self.total_amount = total or 0
+        self.save(update_fields=["total_amount"])
+        record(revenue=self.total_amount - Decimal(str(previous)))
+        record_revenue(self, self.total_amount - Decimal(str(previous)))
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name}"
+
+
+class CrmStats(models.Model):
+    """
+    Running CRM totals, kept in a single row so dashboards read them without
+    scanning Customer/Order. Updated by crm.stats.record() in the same
+    transaction as the writes; `manage.py crm_reconcile_stats` rebuilds it.
+    """
+    customer_count = models.BigIntegerField(default=0)
+    order_count = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "CRM stats"
+
+    def __str__(self):
+        return f"{self.customer_count} customers, {self.order_count} orders, ${self.revenue}"
+
+
+
+class DailyRevenue(models.Model):
+    """
+    Orders and revenue per day of `Order.order_date` (in TIME_ZONE), so
+    charts read a row per day instead of every order. Kept by crm.rollups
+    alongside the writes; `manage.py crm_rebuild_rollups` rebuilds it.
+    """
+    day = models.DateField(unique=True)
+    order_count = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily revenue"
+
+    def __str__(self):
+        return f"{self.day}: {self.order_count} orders, ${self.revenue}"
+
+
+class DailyProductRevenue(models.Model):
+    """
+    DailyRevenue per product: orders containing the product and the price
+    they paid for it, as of when the order was recorded.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    order_count = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily product revenue"
+        constraints = [
+            # Also the index for a product's series.
+            models.UniqueConstraint(fields=["product", "day"], name="crm_daily_product_revenue_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} product {self.product_id}: {self.order_count} orders, ${self.revenue}"
+
+# --------------------------------------------------------------------------
+# Search indexes (see crm.search). SQLite FTS5 tables created and kept in
+# sync by triggers in migration 0005; the models only exist to join them.
+# --------------------------------------------------------------------------
+class SearchDocument(models.TextField):
+    """The hidden column named after an FTS5 table, which `MATCH` queries."""
+
+
+@SearchDocument.register_lookup
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class CustomerSearch(models.Model):
+    customer = models.OneToOneField(
+        Customer, models.DO_NOTHING, primary_key=True, db_column="rowid", db_constraint=False,
+        related_name="search_entry",
+    )
+    document = SearchDocument(db_column="crm_customer_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "crm_customer_search"
+
+
+class ProductSearch(models.Model):
+    product = models.OneToOneField(
+        Product, models.DO_NOTHING, primary_key=True, db_column="rowid", db_constraint=False,
+        related_name="search_entry",
+    )
+    document = SearchDocument(db_column="crm_product_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "crm_product_search"
@@ -0,0 +1,194 @@
+"""
+GraphQL documents run by the CRM's own jobs, and how they are run.
+
+`run_operation` executes them against the schema in-process, unless the
+CRM_GRAPHQL_URL environment variable points the jobs at a server. Over
+HTTP they are sent as persisted queries: the server registers these
+documents at startup (see crm.documents), so the jobs only need to send
+the SHA-256 of the text. The server's schema is introspected once and
+cached on disk to check documents before sending them.
+
+This module is also imported by standalone cron scripts, so it must not
+need Django until an operation runs in-process.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+HEARTBEAT = "query Heartbeat { __typename }"
+
+RESTOCK_LOW_STOCK = """
+mutation RestockLowStock {
+  updateLowStockProducts {
+    message
+    updatedProducts {
+      name
+      stock
+    }
+  }
+}
+"""
+
+CRM_REPORT = """
+query CrmReport {
+  totalCustomers
+  totalOrders
+  totalRevenue
+}
+"""
+
+RECENT_ORDERS = """
+query GetRecentOrders($sevenDaysAgo: Date!, $first: Int!, $after: String) {
+  allOrders(orderDateGte: $sevenDaysAgo, first: $first, after: $after) {
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    edges {
+      node {
+        id
+        orderDate
+        customer {
+          id
+          email
+        }
+      }
+    }
+  }
+}
+"""
+
+KNOWN_OPERATIONS = [HEARTBEAT, RESTOCK_LOW_STOCK, CRM_REPORT, RECENT_ORDERS]
+
+PERSISTED_QUERY_NOT_FOUND = "PERSISTED_QUERY_NOT_FOUND"
+
+GRAPHQL_URL_ENV = "CRM_GRAPHQL_URL"
+SCHEMA_CACHE = os.path.join(tempfile.gettempdir(), "crm_graphql_schema.json")
+
+
+class GraphQLRequestError(Exception):
+    pass
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def run_operation(query, variables=None, url=None):
+    """
+    Run `query` in-process, or on the server at `url` (default: the
+    CRM_GRAPHQL_URL environment variable) when there is one. Returns the
+    response data; GraphQL errors are raised as GraphQLRequestError.
+    """
+    url = url or os.environ.get(GRAPHQL_URL_ENV)
+    if url:
+        return execute_remote(url, query, variables)
+    return execute_local(query, variables)
+
+
+def execute_local(query, variables=None):
+    """Execute `query` against the project schema, setting Django up if needed."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+        django.setup()
+
+    from graphql import OperationType, execute, get_operation_ast
+    from alx_backend_graphql_crm.schema import schema
+    from crm.documents import get_document_cache
+    from crm.routers import read_replica, request_routing
+
+    document, errors = get_document_cache(schema.graphql_schema).get(query)
+    if not errors:
+        # Queries read from the replica, if one is configured (crm.routers).
+        query_operation = get_operation_ast(document).operation == OperationType.QUERY
+        with read_replica() if query_operation else request_routing():
+            # Resolvers keep per-request state (loaders, stats) on the context.
+            result = execute(
+                schema.graphql_schema, document, variable_values=variables, context_value=SimpleNamespace()
+            )
+        errors = result.errors
+    if errors:
+        raise GraphQLRequestError(errors[0].message)
+    return result.data
+
+
+def execute_remote(url, query, variables=None, schema_cache=SCHEMA_CACHE, **kwargs):
+    """
+    `execute_persisted`, after validating `query` against the server's
+    schema cached in `schema_cache`. The schema is introspected when the
+    cache is missing, and again when the cached copy rejects `query`.
+    """
+    from graphql import build_client_schema, parse, validate
+
+    document = parse(query)
+    introspection = _read_schema(schema_cache)
+    for refresh in (False, True):
+        if introspection is None or refresh:
+            introspection = _introspect(url, schema_cache, **kwargs)
+        errors = validate(build_client_schema(introspection), document)
+        if not errors:
+            return execute_persisted(url, query, variables, **kwargs)
+    raise GraphQLRequestError(errors[0].message)
+
+
+def _read_schema(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _introspect(url, path, retries=3, timeout=30):
+    from graphql import get_introspection_query
+
+    body = _session(retries).post(url, json={"query": get_introspection_query()}, timeout=timeout).json()
+    if body.get("errors"):
+        raise GraphQLRequestError(body["errors"][0].get("message"))
+    # Written whole, then renamed, so a concurrent job never reads half a file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "w") as f:
+        json.dump(body["data"], f)
+    os.replace(tmp, path)
+    return body["data"]
+
+
+def execute_persisted(url, query, variables=None, retries=3, timeout=30):
+    """
+    POST `query` to `url` by its hash, and again with the full text if the
+    server hasn't seen it. Returns the response data; GraphQL errors are
+    raised as GraphQLRequestError.
+    """
+    http = _session(retries)
+    payload = {
+        "variables": variables or {},
+        "extensions": {"persistedQuery": {"version": 1, "sha256Hash": query_hash(query)}},
+    }
+    body = http.post(url, json=payload, timeout=timeout).json()
+    if _not_found(body):
+        body = http.post(url, json={**payload, "query": query}, timeout=timeout).json()
+    if body.get("errors"):
+        raise GraphQLRequestError(body["errors"][0].get("message"))
+    return body["data"]
+
+
+def _session(retries):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    http = requests.Session()
+    http.mount("http://", HTTPAdapter(max_retries=retries))
+    http.mount("https://", HTTPAdapter(max_retries=retries))
+    return http
+
+
+def _not_found(body):
+    return any(
+        (error.get("extensions") or {}).get("code") == PERSISTED_QUERY_NOT_FOUND
+        for error in body.get("errors") or []
+    )
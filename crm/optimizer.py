@@ -0,0 +1,110 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def optimize(queryset, info):
+    """
+    Plan `select_related`/`prefetch_related`/`only` for `queryset` from the
+    fields the client selected on the current field.
+
+    Works for plain list fields and for Relay connections, where the model
+    fields live under `edges { node { ... } }`.
+    """
+    selections = _unwrap_connection(_children(info.field_nodes, info.fragments), info.fragments)
+    return _apply(queryset, selections, info.fragments)
+
+
+def _apply(queryset, selections, fragments, keep=()):
+    only, related, prefetches, prunable = _plan(queryset.model, selections, fragments)
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if prunable:
+        queryset = queryset.only(*only, *keep)
+    return queryset
+
+
+def _plan(model, selections, fragments, prefix=""):
+    """
+    Walk one level of the selection set. Forward foreign keys are followed
+    with `select_related` (and keep walking under the same prefix), while
+    many-to-many and reverse relations become a `Prefetch` with their own
+    planned queryset.
+    """
+    only = {prefix + model._meta.pk.name}
+    related = []
+    prefetches = []
+    prunable = True
+
+    for name, nodes in selections.items():
+        if name.startswith("__"):
+            continue
+        field = _model_field(model, name)
+        if field is None:
+            # Resolved by custom code we can't see into; load every column.
+            prunable = False
+            continue
+
+        path = prefix + field.name
+        if not field.is_relation:
+            only.add(path)
+        elif field.many_to_one or (field.one_to_one and field.concrete):
+            children = _children(nodes, fragments)
+            sub_only, sub_related, sub_prefetches, sub_prunable = _plan(
+                field.related_model, children, fragments, prefix=path + "__"
+            )
+            only.add(path)
+            only |= sub_only
+            related += [path, *sub_related]
+            prefetches += sub_prefetches
+            prunable = prunable and sub_prunable
+        else:
+            children = _unwrap_connection(_children(nodes, fragments), fragments)
+            # A reverse foreign key needs its own FK column to attach rows back.
+            keep = (field.field.name,) if field.one_to_many else ()
+            queryset = _apply(field.related_model._default_manager.all(), children, fragments, keep)
+            prefetches.append(Prefetch(path, queryset=queryset))
+
+    return only, related, prefetches, prunable
+
+
+def _model_field(model, name):
+    name = to_snake_case(name)
+    if name == "id":
+        return model._meta.pk
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _children(nodes, fragments):
+    """Merge the sub-selections of `nodes` into {field name: [FieldNode]}."""
+    selections = {}
+    for node in nodes:
+        if node.selection_set is not None:
+            _collect(node.selection_set, fragments, selections)
+    return selections
+
+
+def _collect(selection_set, fragments, selections):
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            selections.setdefault(selection.name.value, []).append(selection)
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(selection.selection_set, fragments, selections)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                _collect(fragment.selection_set, fragments, selections)
+
+
+def _unwrap_connection(selections, fragments):
+    """Return the node selections of a Relay connection, or `selections` as is."""
+    if "edges" not in selections:
+        return selections
+    edges = _children(selections["edges"], fragments)
+    return _children(edges.get("node", []), fragments)
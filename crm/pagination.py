@@ -0,0 +1,243 @@
+import base64
+import json
+
+import graphene
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from graphene.relay.connection import PageInfo
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+from graphql_relay import get_offset_with_default, offset_to_cursor
+
+from .search import RANK
+
+KEYSET_PREFIX = "keyset:"
+
+
+class CountableConnection(graphene.relay.Connection):
+    """
+    A connection with an opt-in `totalCount`. Pages are served without
+    counting; the COUNT(*) only runs when the client selects the field.
+    """
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(
+        at_most=graphene.Int(
+            description="Stop counting past this many rows; a result of atMost + 1 means "
+                        "\"more than atMost\"."
+        )
+    )
+
+    def resolve_total_count(root, info, at_most=None):
+        if at_most is not None and at_most < 0:
+            raise GraphQLError("atMost must not be negative")
+        length = getattr(root, "length", None)
+        if length is not None:
+            # The offset fallback for `last` already had to count.
+            return length if at_most is None else min(length, at_most + 1)
+        if at_most is not None:
+            return root.iterable[:at_most + 1].count()
+        return root.iterable.count()
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """
+    A DjangoFilterConnectionField that pages with `WHERE (cols, id) > (...)`
+    instead of OFFSET, so deep pages cost the same as the first one.
+
+    Cursors carry the values of the ordering columns (plus the primary key
+    as a tie-breaker) of the edge they point at. The `orderBy` argument
+    takes field names such as `["-orderDate"]` or `["-order_date"]`;
+    orderings that keyset paging can't express (nullable columns, related
+    fields, the relevance of a `search`) and requests using `offset` fall
+    back to offset paging. Without `orderBy`, `search` results come best
+    match first.
+    """
+
+    def __init__(self, type_, *args, **kwargs):
+        kwargs.setdefault("order_by", graphene.List(graphene.String))
+        order_by = kwargs.pop("order_by")
+        super().__init__(type_, *args, **kwargs)
+        # DjangoFilterConnectionField swallows `order_by`; expose it as an argument.
+        self._base_args["order_by"] = order_by
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        iterable = maybe_queryset(iterable)
+        order_by = args.get("order_by")
+        if not order_by and RANK in iterable.query.annotations:
+            order_by = [RANK]
+        ordering = _ordering(iterable.model, order_by)
+        iterable = iterable.order_by(*ordering)
+
+        fields = _keyset_fields(iterable.model, ordering)
+        if fields is None or args.get("offset") or _is_offset_cursor(args):
+            return cls.resolve_offset(connection, args, iterable, max_limit)
+        return cls.resolve_keyset(connection, args, iterable, ordering, fields, max_limit)
+
+    @classmethod
+    def resolve_offset(cls, connection, args, qs, max_limit):
+        if args.get("last") is not None or args.get("before"):
+            # Paging from the end needs the length, so let graphene-django count.
+            return super().resolve_connection(connection, args, qs, max_limit)
+
+        first = args.get("first")
+        if first is None:
+            first = max_limit
+        start = args.get("offset") or 0
+        if args.get("after"):
+            start += get_offset_with_default(args["after"], -1) + 1
+
+        rows = list(qs[start:start + first + 1] if first is not None else qs[start:])
+        has_next = first is not None and len(rows) > first
+        edges = [
+            connection.Edge(node=row, cursor=offset_to_cursor(start + i))
+            for i, row in enumerate(rows[:first])
+        ]
+        return _connection(connection, edges, qs, has_previous=start > 0, has_next=has_next)
+
+    @classmethod
+    def resolve_keyset(cls, connection, args, qs, ordering, fields, max_limit):
+        first = args.get("first")
+        last = args.get("last")
+        after = args.get("after")
+        before = args.get("before")
+        if first is None and last is None:
+            first = max_limit
+
+        qs = unpaged = _with_columns(qs, fields)
+        if after:
+            qs = qs.filter(_seek(fields, ordering, _decode(after, fields, ordering), forward=True))
+        if before:
+            qs = qs.filter(_seek(fields, ordering, _decode(before, fields, ordering), forward=False))
+
+        if last is not None and first is None:
+            # Walk backwards from the end (or from `before`) and flip the page.
+            rows = list(qs.reverse()[:last + 1])
+            has_previous = len(rows) > last
+            rows = rows[:last][::-1]
+            has_next = bool(before)
+        else:
+            rows = list(qs[:first + 1]) if first is not None else list(qs)
+            has_next = first is not None and len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                rows = rows[-last:] if last else []
+            has_previous = bool(after)
+
+        edges = [connection.Edge(node=row, cursor=_encode(row, fields, ordering)) for row in rows]
+        return _connection(connection, edges, unpaged, has_previous, has_next)
+
+
+def _connection(connection, edges, iterable, has_previous, has_next):
+    result = connection(
+        edges=edges,
+        page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous,
+            has_next_page=has_next,
+        ),
+    )
+    # What totalCount counts, if it is selected.
+    result.iterable = iterable
+    result.length = None
+    return result
+
+
+def _ordering(model, order_by):
+    ordering = [to_snake_case(f) for f in order_by or [] if f]
+    pk = model._meta.pk.name
+    if not any(f.lstrip("-") in ("pk", pk) for f in ordering):
+        # The primary key makes every position unique; follow the last direction.
+        descending = bool(ordering) and ordering[-1].startswith("-")
+        ordering.append(f"-{pk}" if descending else pk)
+    return ordering
+
+
+def _keyset_fields(model, ordering):
+    """Return the model fields behind `ordering`, or None if keyset paging can't apply."""
+    fields = []
+    for name in ordering:
+        name = name.lstrip("-")
+        if name == "pk":
+            field = model._meta.pk
+        elif "__" in name:
+            return None
+        else:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+        if not field.concrete or field.null or field.many_to_many:
+            return None
+        fields.append(field)
+    return fields
+
+
+def _with_columns(qs, fields):
+    # The cursor reads the ordering columns, so make sure only() kept them.
+    names, deferred = qs.query.deferred_loading
+    if names and not deferred:
+        qs = qs.only(*names, *(f.name for f in fields))
+    return qs
+
+
+def _seek(fields, ordering, values, forward):
+    """
+    Build `(c1, c2, ...) > (v1, v2, ...)` for mixed directions as
+    `c1 >= v1 AND (c1 > v1 OR (c1 = v1 AND (c2 > v2 OR ...)))`, keeping a
+    plain range on the leading column so its index can be used.
+    """
+    def lookup(i, strict):
+        descending = ordering[i].startswith("-") == forward
+        op = ("lt" if descending else "gt") + ("" if strict else "e")
+        return Q(**{f"{fields[i].attname}__{op}": values[i]})
+
+    q = lookup(len(fields) - 1, strict=True)
+    if len(fields) == 1:
+        return q
+    for i in range(len(fields) - 2, -1, -1):
+        q = lookup(i, strict=True) | (Q(**{fields[i].attname: values[i]}) & q)
+    return lookup(0, strict=False) & q
+
+
+def _encode(row, fields, ordering):
+    values = [f.value_to_string(row) for f in fields]
+    payload = json.dumps({"o": ordering, "v": values}, separators=(",", ":"))
+    return base64.b64encode((KEYSET_PREFIX + payload).encode()).decode()
+
+
+def _decode(cursor, fields, ordering):
+    try:
+        raw = base64.b64decode(cursor).decode()
+        payload = json.loads(raw[len(KEYSET_PREFIX):])
+    except (ValueError, TypeError):
+        raise GraphQLError("Invalid cursor")
+    if not raw.startswith(KEYSET_PREFIX) or not isinstance(payload, dict):
+        raise GraphQLError("Invalid cursor")
+    if payload.get("o") != ordering:
+        raise GraphQLError("Cursor does not match the requested ordering")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise GraphQLError("Invalid cursor")
+    try:
+        return [f.to_python(v) for f, v in zip(fields, values)]
+    except ValidationError:
+        raise GraphQLError("Invalid cursor")
+
+
+def _is_offset_cursor(args):
+    # Cursors handed out before keyset paging (arrayconnection:N) still work.
+    for cursor in (args.get("after"), args.get("before")):
+        if cursor:
+            try:
+                if not base64.b64decode(cursor).decode().startswith(KEYSET_PREFIX):
+                    return True
+            except (ValueError, TypeError):
+                return False
+    return False
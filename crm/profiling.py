@@ -0,0 +1,164 @@
+"""
+Per-request resolver profiling for the GraphQL endpoint.
+
+A profiled request records, for every root field and resolver path (list
+indexes dropped, so `allOrders.edges.node.customer` covers the whole page),
+how often the resolver ran, the SQL queries issued while it was the active
+resolver, their DB time and the resolver's own wall time. Root fields also
+get totals covering everything executed beneath them.
+
+Requests are profiled when they carry the `X-CRM-Profile` header (honoured
+in DEBUG or for staff users; the report is then returned under
+`extensions.profile`) or when sampled at `CRM_PROFILE_SAMPLE_RATE`.
+Profiled requests are logged as one JSON line on the `crm.profile`
+logger. Requests that aren't profiled don't go through the middleware.
+"""
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db.models import QuerySet
+from graphql import get_named_type, is_leaf_type
+
+logger = logging.getLogger("crm.profile")
+
+HEADER = "HTTP_X_CRM_PROFILE"
+
+
+class Timing:
+    __slots__ = ("leaf", "calls", "queries", "db_time", "wall_time")
+
+    def __init__(self, leaf=False):
+        self.leaf = leaf
+        self.calls = self.queries = 0
+        self.db_time = self.wall_time = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "queries": self.queries,
+            "dbMs": round(self.db_time * 1000, 3),
+            "wallMs": round(self.wall_time * 1000, 3),
+        }
+
+
+class Profile:
+    """
+    Collects timings for one GraphQL execution. Install it with
+    `connection.execute_wrapper(profile)` so it sees every query.
+    """
+
+    def __init__(self, expose=False):
+        self.expose = expose
+        self.started = time.perf_counter()
+        self.finished = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.paths = {}
+        self.roots = {}
+        # The timings that queries are charged to: the running resolver
+        # and its root field.
+        self.current = ()
+        self._root_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            for timing in self.current:
+                timing.queries += 1
+                timing.db_time += elapsed
+
+    def resolve(self, next, root, info, args):
+        keys = [key for key in info.path.as_list() if isinstance(key, str)]
+        path = ".".join(keys)
+        if len(keys) == 1:
+            self._start_root(path)
+
+        timing = self.paths.get(path)
+        if timing is None:
+            timing = self.paths[path] = Timing(is_leaf_type(get_named_type(info.return_type)))
+        root_timing = self.roots.get(keys[0])
+        # Resolvers don't nest in graphql-core: a field's children run after
+        # it returns. Queries issued while completing its value (a lazy
+        # queryset being listed) are still charged to it.
+        self.current = (timing, root_timing) if root_timing is not None else (timing,)
+
+        start = time.perf_counter()
+        try:
+            result = next(root, info, **args)
+            if isinstance(result, QuerySet):
+                # graphql-core lists it anyway; do it here so the time counts.
+                len(result)
+            return result
+        finally:
+            timing.calls += 1
+            timing.wall_time += time.perf_counter() - start
+
+    def _start_root(self, name):
+        now = time.perf_counter()
+        self._finish_root(now)
+        self.roots[name] = Timing()
+        self.roots[name].calls = 1
+        self._root_started = (name, now)
+
+    def _finish_root(self, now):
+        # Root fields run one after another, so a root field's wall time
+        # spans from its resolver starting to the next one starting.
+        if self._root_started is not None:
+            name, started = self._root_started
+            self.roots[name].wall_time = now - started
+            self._root_started = None
+
+    def finish(self):
+        self.finished = time.perf_counter()
+        self._finish_root(self.finished)
+        self.current = ()
+
+    def report(self):
+        return {
+            "queries": self.queries,
+            "dbMs": round(self.db_time * 1000, 3),
+            "wallMs": round(((self.finished or time.perf_counter()) - self.started) * 1000, 3),
+            "rootFields": {name: timing.as_dict() for name, timing in self.roots.items()},
+            # Scalar fields only show up when they hit the database.
+            "paths": {
+                path: timing.as_dict()
+                for path, timing in self.paths.items()
+                if not timing.leaf or timing.queries
+            },
+        }
+
+
+class ProfilingMiddleware:
+    """Graphene middleware feeding resolver timings into `context.crm_profile`."""
+
+    def resolve(self, next, root, info, **args):
+        profile = getattr(info.context, "crm_profile", None)
+        if profile is None:
+            return next(root, info, **args)
+        return profile.resolve(next, root, info, args)
+
+
+def start_profile(request):
+    """Return a Profile if `request` should be profiled, else None."""
+    expose = bool(request.META.get(HEADER)) and (
+        settings.DEBUG or getattr(getattr(request, "user", None), "is_staff", False)
+    )
+    rate = getattr(settings, "CRM_PROFILE_SAMPLE_RATE", 0.0)
+    if expose or (rate and random.random() < rate):
+        return Profile(expose=expose)
+    return None
+
+
+def log_profile(profile, operation_name=None):
+    logger.info(json.dumps(
+        {"event": "graphql_profile", "operation": operation_name, **profile.report()},
+        separators=(",", ":"),
+    ))
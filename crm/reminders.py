@@ -0,0 +1,65 @@
+"""
+Incremental order reminders for crm/cron_jobs/send_order_reminders.py.
+
+Each run picks up where the last one stopped: the state file keeps the
+keyset cursor of the last order processed (with its id and date, for
+people reading the file), and the next run pages through `allOrders` after
+it, so a run costs as much as the orders placed since. Orders older than
+the reminder window are never read, even on the first run or after a long
+gap. Reminders are grouped per customer.
+
+Like crm.operations, this module must not need Django.
+"""
+import json
+import os
+import tempfile
+
+from crm.operations import RECENT_ORDERS, run_operation
+
+STATE_FILE = os.environ.get(
+    "CRM_REMINDERS_STATE", os.path.join(tempfile.gettempdir(), "order_reminders_state.json")
+)
+# The most a connection hands out per page (RELAY_CONNECTION_MAX_LIMIT).
+PAGE_SIZE = 100
+
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_FILE):
+    # Written whole, then renamed, so a crash never leaves half a file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def pending_reminders(since, state, page_size=PAGE_SIZE, run=run_operation):
+    """
+    Return `(reminders, state)`: the orders placed on or after `since` (an
+    ISO date) and after the high-water mark in `state`, as a dict of
+    customer id to `(email, [order ids])`, and the state to save once they
+    have been sent.
+    """
+    reminders = {}
+    after = state.get("cursor")
+    last = None
+    while True:
+        page = run(RECENT_ORDERS, {"sevenDaysAgo": since, "first": page_size, "after": after})["allOrders"]
+        for edge in page["edges"]:
+            last = order = edge["node"]
+            customer = order["customer"]
+            reminders.setdefault(customer["id"], (customer["email"], []))[1].append(order["id"])
+        after = page["pageInfo"]["endCursor"] or after
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+
+    state = {**state, "cursor": after}
+    if last is not None:
+        state.update(lastOrderId=last["id"], lastOrderDate=last["orderDate"])
+    return reminders, state
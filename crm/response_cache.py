@@ -0,0 +1,210 @@
+"""
+Opt-in response cache for GraphQL query operations.
+
+Configured by the CRM_RESPONSE_CACHE setting:
+
+    CRM_RESPONSE_CACHE = {
+        "CACHE": "graphql",          # alias in CACHES, shared by every process
+        "FIELDS": {                  # "Type.field": TTL in seconds
+            "Query.totalOrders": 60,
+            "Query.allProducts": 30,
+            "ProductType.orders": 10,
+        },
+    }
+
+A query is cached only when every root field it selects is listed in
+FIELDS; its TTL is the lowest TTL of the listed fields it selects anywhere.
+Mutations and queries with errors are never cached.
+
+Results are keyed by the printed (normalized) document, the operation name,
+the variables and a generation number for each model the query can read:
+the models behind the object types it selects, the models they point to
+(filters follow those relations), and the models in FIELD_MODELS. A write
+to a model bumps its generation with `invalidate()`, so stale entries are
+never read again and age out through their TTL. Saves and deletes are
+covered by signals; bulk_create(), update() and raw SQL call invalidate()
+themselves.
+
+The generations live in the cache, so they only reach every process that
+serves or writes (web workers, crm_import, crm_cleanup_inactive, cron jobs)
+if the backend is shared: Redis, memcached, or a FileBasedCache directory
+they all use. A LocMemCache is per process, and another process's writes
+would never invalidate its entries, so it is refused unless the config sets
+"SINGLE_PROCESS": True (one server process and nothing else writing, as in
+tests).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from graphql import (
+    FieldNode, OperationType, TypeInfo, TypeInfoVisitor, Visitor, get_named_type, print_ast, visit,
+)
+
+from .models import Customer, Order
+
+# Root fields that aren't backed by an object type.
+FIELD_MODELS = {
+    "Query.totalCustomers": (Customer,),
+    "Query.totalOrders": (Order,),
+    "Query.totalRevenue": (Order,),
+    "Query.revenueSeries": (Order,),
+}
+
+PLAN_CACHE_SIZE = 256
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def get_config():
+    return getattr(settings, "CRM_RESPONSE_CACHE", None)
+
+
+def _cache(config):
+    alias = config.get("CACHE", "default")
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache) and not config.get("SINGLE_PROCESS"):
+        raise ImproperlyConfigured(
+            f"CRM_RESPONSE_CACHE needs a cache shared between processes; {alias!r} is a "
+            "LocMemCache. Use Redis or memcached, or set SINGLE_PROCESS to True."
+        )
+    return cache
+
+
+def _generation_key(model):
+    return f"crm:gql:gen:{model._meta.label_lower}"
+
+
+class Plan:
+    __slots__ = ("digest", "ttl", "models")
+
+    def __init__(self, digest, ttl, models):
+        self.digest = digest
+        self.ttl = ttl
+        self.models = models
+
+
+def get_plan(schema, document, operation_ast, config):
+    """Return the Plan for caching `operation_ast`, or None if it isn't cacheable."""
+    if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+        return None
+
+    fields = config["FIELDS"]
+    key = (id(document), id(fields), operation_ast.name.value if operation_ast.name else None)
+    with _plans_lock:
+        entry = _plans.get(key)
+        # Documents are shared through crm.documents, so their ids are
+        # stable; the identity checks guard against recycled ids.
+        if entry is not None and entry[0] is document and entry[1] is fields:
+            _plans.move_to_end(key)
+            return entry[2]
+
+    plan = _make_plan(schema, document, operation_ast, fields)
+    with _plans_lock:
+        _plans[key] = (document, fields, plan)
+        if len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def _make_plan(schema, document, operation_ast, ttls):
+    root = schema.query_type.name
+    for selection in operation_ast.selection_set.selections:
+        if not isinstance(selection, FieldNode) or f"{root}.{selection.name.value}" not in ttls:
+            return None
+
+    # Whole-document walk: other operations' fields only make the plan
+    # more conservative.
+    coordinates, types = set(), set()
+    type_info = TypeInfo(schema)
+
+    class Collector(Visitor):
+        def enter_field(self, node, *_):
+            parent = type_info.get_parent_type()
+            if parent is not None:
+                coordinates.add(f"{parent.name}.{node.name.value}")
+            field_type = type_info.get_type()
+            if field_type is not None:
+                types.add(get_named_type(field_type))
+
+    visit(document, TypeInfoVisitor(type_info, Collector()))
+
+    models = set()
+    for coordinate in coordinates:
+        models.update(FIELD_MODELS.get(coordinate, ()))
+    for graphql_type in types:
+        model = getattr(getattr(getattr(graphql_type, "graphene_type", None), "_meta", None), "model", None)
+        if model is not None:
+            models.add(model)
+            models.update(
+                f.related_model for f in model._meta.get_fields()
+                if f.concrete and f.is_relation and f.related_model is not None
+            )
+
+    text = print_ast(document)
+    return Plan(
+        hashlib.sha256(text.encode()).hexdigest(),
+        min(ttl for coordinate, ttl in ttls.items() if coordinate in coordinates),
+        sorted(models, key=lambda m: m._meta.label_lower),
+    )
+
+
+def _key(cache, plan, variables, operation_name):
+    keys = [_generation_key(m) for m in plan.models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # A fresh, never-used generation, so a lost counter can't bring
+            # back entries written under an old one.
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    payload = json.dumps(
+        [plan.digest, operation_name, variables or {}, [generations[k] for k in keys]],
+        sort_keys=True, default=str, separators=(",", ":"),
+    )
+    return "crm:gql:response:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lookup(schema, document, operation_ast, variables, operation_name):
+    """
+    Return `(data, store)`: the cached data for the request, or None and a
+    callable that stores the data once executed (or None if not cacheable).
+    """
+    config = get_config()
+    if not config:
+        return None, None
+    plan = get_plan(schema, document, operation_ast, config)
+    if plan is None:
+        return None, None
+
+    cache = _cache(config)
+    key = _key(cache, plan, variables, operation_name)
+    data = cache.get(key)
+    if data is not None:
+        return data, None
+    return None, lambda data: cache.set(key, data, plan.ttl)
+
+
+def invalidate(*models):
+    """Bump the generation of `models`; cached responses that read them go stale."""
+    config = get_config()
+    if not config:
+        return
+    cache = _cache(config)
+    for model in models:
+        key = _generation_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+    # A response cached between this write and its commit would hold the old
+    # rows under the new generation; bump again once the data is visible.
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*models))
@@ -0,0 +1,197 @@
+"""
+Daily revenue rollups (DailyRevenue, DailyProductRevenue) and the revenue
+series read from them.
+
+The rollups are kept current the way crm.stats keeps the summary row:
+single-row order saves, deletes and product changes through signals, and
+the bulk paths (bulk.create_orders, bulk.delete_customers, crm_import)
+explicitly. Each change is one upsert per table, adding to the counters
+(`INSERT ... ON CONFLICT DO UPDATE SET n = n + excluded.n`), in the
+transaction of the write.
+
+A product's revenue is its price when the order was recorded. There is no
+price history, so taking an order out subtracts current prices, and
+`manage.py crm_rebuild_rollups` (rebuild()) recomputes every row from
+current prices.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductRevenue, DailyRevenue, Order
+
+DAY, WEEK, MONTH = "day", "week", "month"
+# Ten years of days.
+MAX_POINTS = 3660
+# Rows per upsert statement, within SQLite's limit on parameters.
+UPSERT_BATCH = 200
+
+
+def _deltas():
+    return defaultdict(lambda: [0, Decimal(0)])
+
+
+def record(pairs, sign=1):
+    """Add `(order, products)` pairs to both rollups; `sign=-1` takes them out."""
+    days, products = _deltas(), _deltas()
+    for order, items in pairs:
+        day = timezone.localdate(order.order_date)
+        days[day][0] += sign
+        days[day][1] += sign * Decimal(str(order.total_amount))
+        for product in items:
+            products[day, product.pk][0] += sign
+            products[day, product.pk][1] += sign * product.price
+    _upsert(DailyRevenue, ("day",), days)
+    _upsert(DailyProductRevenue, ("day", "product_id"), products)
+
+
+def record_products(order, products, sign=1):
+    """Add `products` (with their price) of an existing order to the product rollup."""
+    day = timezone.localdate(order.order_date)
+    deltas = _deltas()
+    for product in products:
+        deltas[day, product.pk] = [sign, sign * product.price]
+    _upsert(DailyProductRevenue, ("day", "product_id"), deltas)
+
+
+def record_revenue(order, change):
+    """Apply a change to the total of an existing order."""
+    deltas = _deltas()
+    deltas[timezone.localdate(order.order_date)][1] = Decimal(str(change))
+    _upsert(DailyRevenue, ("day",), deltas)
+
+
+def forget(orders):
+    """Take the orders in the queryset `orders` out of both rollups, before deleting them."""
+    days, products = _deltas(), _deltas()
+    for row in _by_day(orders):
+        days[row["day"]] = [-row["count"], -(row["revenue"] or 0)]
+    for row in _by_day_and_product(Order.products.through.objects.filter(order__in=orders)):
+        products[row["day"], row["product_id"]] = [-row["count"], -(row["revenue"] or 0)]
+    _upsert(DailyRevenue, ("day",), days)
+    _upsert(DailyProductRevenue, ("day", "product_id"), products)
+
+
+def rebuild():
+    """Recompute both rollups from Order and its products; return their row counts."""
+    Through = Order.products.through
+    with transaction.atomic():
+        DailyRevenue.objects.all().delete()
+        DailyProductRevenue.objects.all().delete()
+        DailyRevenue.objects.bulk_create(
+            DailyRevenue(day=row["day"], order_count=row["count"], revenue=row["revenue"] or 0)
+            for row in _by_day(Order.objects.all()).iterator()
+        )
+        DailyProductRevenue.objects.bulk_create(
+            (DailyProductRevenue(day=row["day"], product_id=row["product_id"], order_count=row["count"],
+                                 revenue=row["revenue"] or 0)
+             for row in _by_day_and_product(Through.objects.all()).iterator()),
+            batch_size=1000,
+        )
+        return DailyRevenue.objects.count(), DailyProductRevenue.objects.count()
+
+
+def _by_day(orders):
+    return (
+        orders.annotate(day=TruncDate("order_date")).values("day")
+        .annotate(count=Count("pk"), revenue=Sum("total_amount")).order_by()
+    )
+
+
+def _by_day_and_product(links):
+    return (
+        links.annotate(day=TruncDate("order__order_date")).values("day", "product_id")
+        .annotate(count=Count("pk"), revenue=Sum(F("product__price"))).order_by()
+    )
+
+
+def _upsert(model, keys, deltas):
+    """Add `{key values: [order_count, revenue]}` to the rows of `model`, creating missing ones."""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    keyed = [key if isinstance(key, tuple) else (key,) for key in deltas]
+    if not connection.features.supports_update_conflicts_with_target:
+        for key, (count, revenue) in zip(keyed, deltas.values()):
+            lookup = dict(zip(keys, key))
+            if not model.objects.filter(**lookup).update(
+                order_count=F("order_count") + count, revenue=F("revenue") + revenue
+            ):
+                model.objects.create(**lookup, order_count=count, revenue=revenue)
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_columns = ", ".join(qn(model._meta.get_field(k).column) for k in keys)
+    count, revenue = qn("order_count"), qn("revenue")
+    ops = connection.ops
+    rows = [
+        (ops.adapt_datefield_value(key[0]), *key[1:], n, ops.adapt_decimalfield_value(amount))
+        for key, (n, amount) in zip(keyed, deltas.values())
+    ]
+    placeholder = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH):
+            batch = rows[start:start + UPSERT_BATCH]
+            cursor.execute(
+                f"INSERT INTO {table} ({key_columns}, {count}, {revenue}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({key_columns}) DO UPDATE SET "
+                f"{count} = {table}.{count} + excluded.{count}, {revenue} = {table}.{revenue} + excluded.{revenue}",
+                [value for row in batch for value in row],
+            )
+
+
+def _bucket(day, granularity):
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, granularity):
+    if granularity == WEEK:
+        return start + timedelta(days=7)
+    if granularity == MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def series(start, end, granularity=DAY, product_id=None):
+    """
+    Return `(bucket start, orders, revenue)` for every day, ISO week
+    (from Monday) or month from `start` to `end` inclusive, zeros where
+    nothing was sold. The first and last buckets only count days within
+    the range. With `product_id`, counts orders containing that product
+    and its revenue.
+    """
+    if start > end:
+        raise ValueError("start must not be after end")
+    first = _bucket(start, granularity)
+    points = (end - first).days // {WEEK: 7, MONTH: 28}.get(granularity, 1) + 1
+    if points > MAX_POINTS:
+        raise ValueError(f"A series has at most {MAX_POINTS} points; use a larger granularity")
+
+    if product_id is not None:
+        rows = DailyProductRevenue.objects.filter(product_id=product_id)
+    else:
+        rows = DailyRevenue.objects
+    totals = _deltas()
+    for day, count, revenue in rows.filter(day__range=(start, end)).values_list("day", "order_count", "revenue"):
+        bucket = totals[_bucket(day, granularity)]
+        bucket[0] += count
+        bucket[1] += revenue
+
+    result = []
+    bucket = first
+    while bucket <= end:
+        count, revenue = totals.get(bucket, (0, Decimal(0)))
+        result.append((bucket, count, revenue))
+        bucket = _next_bucket(bucket, granularity)
+    return result
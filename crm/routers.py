@@ -0,0 +1,102 @@
+"""
+Database router that sends the reads of GraphQL query operations to a read
+replica.
+
+The replica is the DATABASES alias named by the CRM_READ_REPLICA setting;
+when that alias isn't configured everything uses "default". Reads go to
+the replica only inside `read_replica()`, which the GraphQL views and
+`crm.operations.execute_local` enter for query operations. Everything else
+reads and writes the primary:
+
+- mutations, and any code outside `read_replica()`;
+- reads inside `transaction.atomic` on the primary, so a transaction sees
+  its own writes and the rows it locked;
+- every read for the rest of the request once anything has written
+  (read-your-writes). The request is the `request_routing()` block, which
+  the views enter per HTTP request; `read_replica()` opens one when none
+  is open.
+
+Raw SQL on `django.db.connection` always runs on the primary. A lagging
+replica can put a stale result in the response cache (crm.response_cache)
+under the current generation; it is served until its TTL runs out.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_routing = ContextVar("crm_db_routing", default=None)
+
+
+class _Routing:
+    __slots__ = ("replica", "wrote")
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+def replica_alias():
+    """The configured read replica alias, or None."""
+    alias = getattr(settings, "CRM_READ_REPLICA", None)
+    return alias if alias and alias in connections.settings else None
+
+
+def read_alias():
+    """Alias for reads that don't go through the router's request state."""
+    return replica_alias() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def request_routing():
+    """Scope of read-your-writes stickiness, usually one HTTP request."""
+    token = _routing.set(_Routing())
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+@contextmanager
+def read_replica():
+    """Route reads in this block to the replica, see the module docstring."""
+    routing = _routing.get()
+    if routing is None:
+        with request_routing(), read_replica():
+            yield
+        return
+
+    previous, routing.replica = routing.replica, True
+    try:
+        yield
+    finally:
+        routing.replica = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Answer for the primary explicitly too: left to Django, related
+        # objects would be read from wherever their instance came from.
+        alias = replica_alias()
+        if alias is None:
+            return None
+        routing = _routing.get()
+        if routing is None or not routing.replica or routing.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -1,17 +1,14 @@
-import re
 import graphene
 from graphene_django import DjangoObjectType
 from django.db import transaction
-from django.db.models import F
-from django.core.exceptions import ValidationError
+from . import bulk, rollups
 from .models import Customer, Product, Order
-
-import graphene
-from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
-from .models import Customer, Product, Order
-from crm.models import Product
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .loaders import get_loaders
+from .optimizer import optimize
+from .pagination import CountableConnection, KeysetConnectionField
+from .stats import get_stats
+from .validators import phone_error, product_error
 
 
 # --------------------
@@ -21,69 +18,145 @@ class CustomerType(DjangoObjectType):
     class Meta:
         model = Customer
         interfaces = (graphene.relay.Node,)
-        fields = ("id", "name", "email", "phone", "created_at")
+        connection_class = CountableConnection
+        fields = ("id", "name", "email", "phone", "created_at", "orders")
 
 
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
         interfaces = (graphene.relay.Node,)
-        fields = ("id", "name", "price", "stock")
+        connection_class = CountableConnection
+        fields = ("id", "name", "price", "stock", "orders")
+
+
+class OrderConnection(CountableConnection):
+    class Meta:
+        abstract = True
+
+    def resolve_edges(root, info):
+        # Queue the customer/product keys of the whole page so the first
+        # node that asks for them loads the lot in one query.
+        get_loaders(info).prime_orders(edge.node for edge in root.edges)
+        return root.edges
 
 
 class OrderType(DjangoObjectType):
+    customer = graphene.NonNull(CustomerType)
+    products = graphene.NonNull(graphene.List(graphene.NonNull(ProductType)))
+
     class Meta:
         model = Order
         interfaces = (graphene.relay.Node,)
+        connection_class = OrderConnection
         fields = ("id", "customer", "products", "total_amount", "order_date")
 
+    def resolve_customer(root, info):
+        # Already joined in by the optimizer's select_related.
+        if Order.customer.is_cached(root):
+            return root.customer
+        return get_loaders(info).customer_by_id.load(root.customer_id)
+
+    def resolve_products(root, info):
+        # Already fetched by the optimizer's prefetch_related.
+        if "products" in getattr(root, "_prefetched_objects_cache", {}):
+            return root.products.all()
+        return get_loaders(info).products_by_order.load(root.pk)
+
+
+class RevenueGranularity(graphene.Enum):
+    DAY = rollups.DAY
+    WEEK = rollups.WEEK
+    MONTH = rollups.MONTH
+
+
+class RevenuePoint(graphene.ObjectType):
+    start = graphene.Date(required=True, description="First day of the bucket.")
+    orders = graphene.Int(required=True)
+    revenue = graphene.Float(required=True)
+
 
 # --------------------
 # Queries with Filters
 # --------------------
 class Query(graphene.ObjectType):
-    all_customers = DjangoFilterConnectionField(CustomerType, filterset_class=CustomerFilter, order_by=graphene.List(of_type=graphene.String))
-    all_products = DjangoFilterConnectionField(ProductType, filterset_class=ProductFilter, order_by=graphene.List(of_type=graphene.String))
-    all_orders = DjangoFilterConnectionField(OrderType, filterset_class=OrderFilter, order_by=graphene.List(of_type=graphene.String))
+    all_customers = KeysetConnectionField(CustomerType, filterset_class=CustomerFilter, order_by=graphene.List(of_type=graphene.String))
+    all_products = KeysetConnectionField(ProductType, filterset_class=ProductFilter, order_by=graphene.List(of_type=graphene.String))
+    all_orders = KeysetConnectionField(OrderType, filterset_class=OrderFilter, order_by=graphene.List(of_type=graphene.String))
+
+    customers = graphene.List(CustomerType)
+    products = graphene.List(ProductType)
+    orders = graphene.List(OrderType)
 
     total_customers = graphene.Int()
     total_orders = graphene.Int()
     total_revenue = graphene.Float()
+    revenue_series = graphene.List(
+        graphene.NonNull(RevenuePoint),
+        start=graphene.Date(required=True),
+        end=graphene.Date(required=True),
+        granularity=RevenueGranularity(default_value=rollups.DAY),
+        product_id=graphene.ID(),
+        description="Orders and revenue per day, week or month from start to end inclusive, "
+                    "with empty buckets filled in; with productId, for orders containing that product.",
+    )
 
     def resolve_all_customers(self, info, **kwargs):
-        qs = Customer.objects.all()
-        order_by = kwargs.get("order_by")
-        if order_by:
-            qs = qs.order_by(*order_by)
-        return qs
+        # Filtering, ordering and paging are applied by KeysetConnectionField.
+        return optimize(Customer.objects.all(), info)
 
     def resolve_all_products(self, info, **kwargs):
-        qs = Product.objects.all()
-        order_by = kwargs.get("order_by")
-        if order_by:
-            qs = qs.order_by(*order_by)
-        return qs
+        # Filtering, ordering and paging are applied by KeysetConnectionField.
+        return optimize(Product.objects.all(), info)
 
     def resolve_all_orders(self, info, **kwargs):
-        qs = Order.objects.all()
-        order_by = kwargs.get("order_by")
-        if order_by:
-            qs = qs.order_by(*order_by)
-        return qs
-        
+        # Filtering, ordering and paging are applied by KeysetConnectionField.
+        return optimize(Order.objects.all(), info)
+
+    def resolve_customers(root, info):
+        return optimize(Customer.objects.all(), info)
+
+    def resolve_products(root, info):
+        return optimize(Product.objects.all(), info)
+
+    def resolve_orders(root, info):
+        orders = list(optimize(Order.objects.all(), info))
+        get_loaders(info).prime_orders(orders)
+        return orders
+
     def resolve_total_customers(root, info):
-        # Returns the total count of customers.
-        return Customer.objects.count()
+        # Read from the maintained summary row instead of counting.
+        return _request_stats(info).customer_count
 
     def resolve_total_orders(root, info):
-        # Returns the total count of orders.
-        return Order.objects.count()
+        return _request_stats(info).order_count
 
     def resolve_total_revenue(root, info):
-        # Calculates the sum of 'total_amount' across all orders.
-        # The result might be None if there are no orders, so we default to 0.
-        aggregation = Order.objects.aggregate(total_revenue=Sum('total_amount'))
-        return aggregation['total_revenue'] or 0.0
+        return float(_request_stats(info).revenue)
+
+    def resolve_revenue_series(root, info, start, end, granularity=rollups.DAY, product_id=None):
+        # Read from the daily rollups, not the orders.
+        if product_id is not None:
+            try:
+                product_id = int(product_id)
+            except ValueError:
+                raise Exception("Invalid product ID")
+        granularity = getattr(granularity, "value", granularity)
+        return [
+            RevenuePoint(start=day, orders=count, revenue=float(revenue))
+            for day, count, revenue in rollups.series(start, end, granularity, product_id)
+        ]
+
+
+def _request_stats(info):
+    # One summary-row read serves all the total* fields of a request.
+    context = info.context
+    stats = getattr(context, "crm_stats", None)
+    if stats is None:
+        stats = get_stats()
+        if context is not None:
+            context.crm_stats = stats
+    return stats
 
 # -------------------------
 # Object Types
@@ -93,23 +166,6 @@ class CustomerInput(graphene.InputObjectType):
     email = graphene.String(required=True)
     phone = graphene.String(required=False)
 
-class CustomerType(DjangoObjectType):
-    class Meta:
-        model = Customer
-        fields = ("id", "name", "email", "phone")
-
-
-class ProductType(DjangoObjectType):
-    class Meta:
-        model = Product
-        fields = ("id", "name", "price", "stock")
-
-
-class OrderType(DjangoObjectType):
-    class Meta:
-        model = Order
-        fields = ("id", "customer", "products", "total_amount", "order_date")
-
 
 # -------------------------
 # Mutations
@@ -129,10 +185,9 @@ class CreateCustomer(graphene.Mutation):
             raise Exception("Email already exists")
 
         # Phone validation
-        if phone:
-            phone_pattern = re.compile(r"^\+?\d[\d\-]+$")
-            if not phone_pattern.match(phone):
-                raise Exception("Invalid phone format")
+        error = phone_error(phone)
+        if error:
+            raise Exception(error)
 
         customer = Customer(name=name, email=email, phone=phone)
         customer.save()
@@ -177,26 +232,16 @@ class CreateCustomer(graphene.Mutation):
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         customers = graphene.List(CustomerInput, required=True)
+        batch_size = graphene.Int(required=False, default_value=bulk.BATCH_SIZE)
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
 
-    def mutate(self, info, customers):
-        created = []
-        errors = []
-
-        for c in customers:
-            try:
-                if Customer.objects.filter(email=c.email).exists():
-                    errors.append(f"Email already exists: {c.email}")
-                    continue
-                customer = Customer(name=c.name, email=c.email, phone=c.phone or "")
-                customer.full_clean()
-                customer.save()
-                created.append(customer)
-            except ValidationError as e:
-                errors.append(f"{c.email}: {str(e)}")
+    def mutate(self, info, customers, batch_size=bulk.BATCH_SIZE):
+        if batch_size < 1:
+            raise Exception("Batch size must be positive")
 
+        created, errors = bulk.create_customers(customers, batch_size=batch_size)
         return BulkCreateCustomers(customers=created, errors=errors)
 
 
@@ -209,10 +254,9 @@ class CreateProduct(graphene.Mutation):
     product = graphene.Field(ProductType)
 
     def mutate(self, info, name, price, stock=0):
-        if price <= 0:
-            raise Exception("Price must be positive")
-        if stock < 0:
-            raise Exception("Stock cannot be negative")
+        error = product_error(price, stock)
+        if error:
+            raise Exception(error)
 
         product = Product(name=name, price=price, stock=stock)
         product.save()
@@ -235,73 +279,79 @@ class CreateOrder(graphene.Mutation):
         if not product_ids:
             raise Exception("At least one product must be selected")
 
-        products = Product.objects.filter(id__in=product_ids)
-        if len(products) != len(product_ids):
-            raise Exception("One or more product IDs are invalid")
-
         with transaction.atomic():
-            order = Order(customer=customer)
-            order.save()
-            order.products.set(products)
-            order.total_amount = sum([p.price for p in products])
-            order.save()
+            products = bulk.lock_products(product_ids)
+            if len(products) != len(product_ids):
+                raise Exception("One or more product IDs are invalid")
+
+            # One unit of each product; a shortage rolls the order back.
+            bulk.reserve_stock(dict.fromkeys(products, 1), locked=products)
+            products = list(products.values())
+            order = Order.objects.create(customer=customer, total_amount=sum(p.price for p in products))
+            bulk.link_products([(order, products)])
+            rollups.record_products(order, products)
 
         return CreateOrder(order=order)
 
 
-# -------------------------
-# Query + Mutation Root
-# -------------------------
-class Query(graphene.ObjectType):
-    customers = graphene.List(CustomerType)
-    products = graphene.List(ProductType)
-    orders = graphene.List(OrderType)
+class OrderInput(graphene.InputObjectType):
+    customer_id = graphene.ID(required=True)
+    product_ids = graphene.List(graphene.ID, required=True)
 
-    def resolve_customers(root, info):
-        return Customer.objects.all()
 
-    def resolve_products(root, info):
-        return Product.objects.all()
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        orders = graphene.List(OrderInput, required=True)
+        batch_size = graphene.Int(required=False, default_value=bulk.BATCH_SIZE)
 
-    def resolve_orders(root, info):
-        return Order.objects.all()
+    orders = graphene.List(OrderType)
+    errors = graphene.List(graphene.String)
 
+    def mutate(self, info, orders, batch_size=bulk.BATCH_SIZE):
+        if batch_size < 1:
+            raise Exception("Batch size must be positive")
+
+        created, errors = bulk.create_orders(orders, batch_size=batch_size)
+        get_loaders(info).prime_orders(created)
+        return BulkCreateOrders(orders=created, errors=errors)
 
-class Mutation(graphene.ObjectType):
-    create_customer = CreateCustomer.Field()
-    bulk_create_customers = BulkCreateCustomers.Field()
-    create_product = CreateProduct.Field()
-    create_order = CreateOrder.Field()
 
 class UpdateLowStockProducts(graphene.Mutation):
     """
-    Finds all products with stock less than 10, increments their stock
-    by 10, and returns the list of updated products.
+    Adds `increment` to the stock of every product with less than
+    `threshold` and returns them with their new stock.
     """
     class Arguments:
-        # No arguments needed as the logic is predefined
-        pass
+        threshold = graphene.Int(required=False, default_value=bulk.RESTOCK_THRESHOLD)
+        increment = graphene.Int(required=False, default_value=bulk.RESTOCK_INCREMENT)
+        batch_size = graphene.Int(required=False, default_value=bulk.BATCH_SIZE)
 
-    # Define the output fields of the mutation
     updated_products = graphene.List(ProductType)
     message = graphene.String()
 
-    @staticmethod
-    def mutate(root, info):
-        # Find products with stock less than 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
-        if not low_stock_products.exists():
+    def mutate(
+        self, info,
+        threshold=bulk.RESTOCK_THRESHOLD, increment=bulk.RESTOCK_INCREMENT, batch_size=bulk.BATCH_SIZE,
+    ):
+        if increment < 1:
+            raise Exception("Increment must be positive")
+        if batch_size < 1:
+            raise Exception("Batch size must be positive")
+
+        updated = bulk.restock(threshold, increment, batch_size=batch_size)
+        if not updated:
             return UpdateLowStockProducts(updated_products=[], message="No low-stock products found to update.")
+        message = f"Successfully restocked {len(updated)} low-stock product(s)."
+        return UpdateLowStockProducts(updated_products=updated, message=message)
 
-        # Atomically increment the stock by 10 for all found products
-        # Using F() prevents race conditions and is more efficient.
-        low_stock_products.update(stock=F('stock') + 10)
-
-        # Refresh the queryset from the database to get the new stock values
-        updated_products_qs = Product.objects.filter(pk__in=low_stock_products.values_list('pk', flat=True))
-        
-        count = updated_products_qs.count()
-        message = f"Successfully restocked {count} low-stock product(s)."
 
-        return UpdateLowStockProducts(updated_products=list(updated_products_qs), message=message)
+# -------------------------
+# Mutation Root
+# -------------------------
+class Mutation(graphene.ObjectType):
+    create_customer = CreateCustomer.Field()
+    bulk_create_customers = BulkCreateCustomers.Field()
+    create_product = CreateProduct.Field()
+    create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
+    update_low_stock_products = UpdateLowStockProducts.Field()
@@ -0,0 +1,71 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import rollups
+from .models import Customer, Product, Order
+from .response_cache import invalidate
+from .stats import record
+
+# Single-row saves and deletes are counted here, in the summary row and
+# the revenue rollups. bulk_create() and raw deletes send no signals, so
+# those code paths call record() and crm.rollups themselves.
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record(customers=1)
+
+
+@receiver(post_delete, sender=Customer)
+def customer_deleted(sender, instance, **kwargs):
+    record(customers=-1)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record(orders=1, revenue=instance.total_amount)
+        rollups.record([(instance, ())])
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    # Before Django's cascade removes the order's products.
+    rollups.forget(Order.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    record(orders=-1, revenue=-instance.total_amount)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def order_products_rolled_up(sender, instance, action, reverse, pk_set, **kwargs):
+    # Products added to or removed from an existing order. bulk.link_products
+    # sends no signal; its callers record the products they link.
+    if reverse or action not in ("post_add", "pre_remove", "pre_clear"):
+        return
+    products = instance.products.all()
+    if action != "pre_clear":
+        products = (Product.objects if action == "post_add" else products).filter(pk__in=pk_set)
+    rollups.record_products(instance, products, sign=1 if action == "post_add" else -1)
+
+
+# Cached GraphQL responses (crm.response_cache) go stale on any write.
+# bulk_create(), update() and raw SQL call invalidate() themselves.
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def model_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate(sender)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def order_products_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate(Order)
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Customer, Order, CrmStats
+
+STATS_PK = 1
+
+
+def get_stats():
+    """Return the summary row, building it from scratch if it is missing."""
+    stats = CrmStats.objects.filter(pk=STATS_PK).first()
+    return stats if stats is not None else rebuild()
+
+
+async def aget_stats():
+    """get_stats() for async code."""
+    try:
+        return await CrmStats.objects.aget(pk=STATS_PK)
+    except CrmStats.DoesNotExist:
+        return await sync_to_async(rebuild)()
+
+
+def record(customers=0, orders=0, revenue=0):
+    """Apply a delta to the summary row with a single UPDATE."""
+    if not (customers or orders or revenue):
+        return
+    updated = CrmStats.objects.filter(pk=STATS_PK).update(
+        customer_count=F("customer_count") + customers,
+        order_count=F("order_count") + orders,
+        revenue=F("revenue") + Decimal(str(revenue)),
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        # The row is rebuilt from the tables, which already include this write.
+        rebuild()
+
+
+def rebuild():
+    """Recompute the summary row from Customer/Order and return it."""
+    with transaction.atomic():
+        stats, _ = CrmStats.objects.select_for_update().get_or_create(pk=STATS_PK)
+        stats.customer_count = Customer.objects.count()
+        aggregate = Order.objects.aggregate(count=Count("pk"), revenue=Sum("total_amount"))
+        stats.order_count = aggregate["count"]
+        stats.revenue = aggregate["revenue"] or 0
+        stats.save()
+    return stats
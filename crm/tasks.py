@@ -1,36 +1,19 @@
 import datetime
 from celery import shared_task
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
-from datetime import datetime
-import requests
+from crm.operations import CRM_REPORT, run_operation
 
 @shared_task
 def generate_crm_report():
     """
-    A Celery task that queries the GraphQL endpoint for CRM statistics
-    and logs them to a report file.
+    A Celery task that queries GraphQL for CRM statistics (in the worker
+    process unless CRM_GRAPHQL_URL is set) and logs them to a report file.
     """
     log_file_path = "/tmp/crm_report_log.txt"
-    graphql_endpoint_url = "http://localhost:8000/graphql"
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # GraphQL query to fetch the aggregate data from our new schema fields.
-    report_query = gql("""
-        query CrmReport {
-          totalCustomers
-          totalOrders
-          totalRevenue
-        }
-    """)
-
     try:
-        # Set up the GraphQL client
-        transport = RequestsHTTPTransport(url=graphql_endpoint_url, retries=3)
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-
-        # Execute the query
-        result = client.execute(report_query)
+        # Execute the query (CRM_REPORT in crm/operations.py)
+        result = run_operation(CRM_REPORT)
 
         customers = result['totalCustomers']
         orders = result['totalOrders']
@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections, transaction
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from graphql_relay import from_global_id, to_global_id
+
+from alx_backend_graphql_crm.schema import schema
+from . import bulk
+from .documents import get_document_cache
+from .filters import CustomerFilter, OrderFilter
+from .loaders import Loaders
+from .models import Customer, Product, Order, CrmStats, DailyProductRevenue, DailyRevenue
+from .operations import CRM_REPORT, GraphQLRequestError, execute_remote, query_hash, run_operation
+from .reminders import load_state, pending_reminders, save_state
+from .rollups import rebuild as rebuild_rollups
+from .routers import read_replica
+from .schema import UpdateLowStockProducts
+from .stats import rebuild
+
+
+def seed_orders(n, products_per_order=2):
+    customers = Customer.objects.bulk_create(
+        Customer(name=f"Customer {i}", email=f"customer{i}@example.com") for i in range(n)
+    )
+    products = Product.objects.bulk_create(
+        Product(name=f"Product {i}", price=10 + i, stock=100) for i in range(products_per_order + 1)
+    )
+    orders = Order.objects.bulk_create(Order(customer=c) for c in customers)
+    Through = Order.products.through
+    Through.objects.bulk_create(
+        Through(order_id=o.pk, product_id=products[(i + j) % len(products)].pk)
+        for i, o in enumerate(orders)
+        for j in range(products_per_order)
+    )
+    return orders
+
+
+def execute(query, **variables):
+    context = RequestFactory().post("/graphql")
+    result = schema.execute(query, variable_values=variables, context_value=context)
+    assert result.errors is None, result.errors
+    return result.data
+
+
+class OrderLoaderTests(TestCase):
+    ALL_ORDERS = """
+        query ($first: Int) {
+          allOrders(first: $first) {
+            edges { node { id customer { email } products { name } } }
+          }
+        }
+    """
+    ORDERS = "{ orders { id customer { email } products { name } } }"
+
+    def test_connection_query_count_is_constant(self):
+        seed_orders(30)
+        for first in (1, 5, 30):
+            # page joined with customers + products
+            with self.assertNumQueries(2):
+                data = execute(self.ALL_ORDERS, first=first)
+            self.assertEqual(len(data["allOrders"]["edges"]), first)
+
+    def test_list_query_count_is_constant(self):
+        for n in (1, 10):
+            seed_orders(n)
+            # orders joined with customers + products
+            with self.assertNumQueries(2):
+                data = execute(self.ORDERS)
+            Order.objects.all().delete()
+            Customer.objects.all().delete()
+            Product.objects.all().delete()
+        self.assertEqual(len(data["orders"]), 10)
+
+    def test_products_resolve_per_order(self):
+        orders = seed_orders(3)
+        data = execute(self.ORDERS)
+        by_order = {o.pk: sorted(p.name for p in o.products.all()) for o in orders}
+        self.assertEqual(
+            [sorted(p["name"] for p in o["products"]) for o in data["orders"]],
+            [by_order[o.pk] for o in orders],
+        )
+        self.assertEqual(data["orders"][0]["customer"]["email"], "customer0@example.com")
+
+    def test_loaders_batch_a_primed_page(self):
+        seed_orders(5)
+        orders = list(Order.objects.all())
+        loaders = Loaders()
+        loaders.prime_orders(orders)
+        with self.assertNumQueries(2):
+            for order in orders:
+                self.assertEqual(loaders.customer_by_id.load(order.customer_id).pk, order.customer_id)
+                self.assertEqual(len(loaders.products_by_order.load(order.pk)), 2)
+
+
+class QueryOptimizerTests(TestCase):
+    def test_reverse_relations_are_prefetched(self):
+        seed_orders(10)
+        query = """
+            { allCustomers { edges { node { email orders { edges { node { totalAmount products { name } } } } } } } }
+        """
+        # customers + orders + products
+        with self.assertNumQueries(3):
+            data = execute(query)
+        node = data["allCustomers"]["edges"][0]["node"]
+        self.assertEqual(len(node["orders"]["edges"][0]["node"]["products"]), 2)
+
+    def test_unselected_columns_are_deferred(self):
+        seed_orders(1)
+        query = """
+            fragment CustomerFields on CustomerType { email }
+            { orders { id customer { ...CustomerFields } } }
+        """
+        with self.assertNumQueries(1) as ctx:
+            execute(query)
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertIn('"crm_customer"."email"', sql)
+        self.assertNotIn('"crm_customer"."name"', sql)
+        self.assertNotIn('"crm_order"."total_amount"', sql)
+
+
+class BulkCreateCustomersTests(TestCase):
+    MUTATION = """
+        mutation ($customers: [CustomerInput]!, $batchSize: Int) {
+          bulkCreateCustomers(customers: $customers, batchSize: $batchSize) {
+            customers { email }
+            errors
+          }
+        }
+    """
+
+    def test_duplicates_and_invalid_rows_are_reported(self):
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        rows = [
+            {"name": "Alice", "email": "alice@example.com"},
+            {"name": "Bob", "email": "bob@example.com"},
+            {"name": "Bob again", "email": "bob@example.com"},
+            {"name": "Carol", "email": "not-an-email"},
+            {"name": "Dan", "email": "dan@example.com", "phone": "+1234"},
+        ]
+        data = execute(self.MUTATION, customers=rows, batchSize=2)["bulkCreateCustomers"]
+        self.assertEqual([c["email"] for c in data["customers"]], ["bob@example.com", "dan@example.com"])
+        self.assertEqual(data["errors"][:2], [
+            "Email already exists: alice@example.com",
+            "Email already exists: bob@example.com",
+        ])
+        self.assertTrue(data["errors"][2].startswith("not-an-email: "))
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_query_count_scales_with_chunks_not_rows(self):
+        rows = [{"name": f"C{i}", "email": f"c{i}@example.com"} for i in range(50)]
+        # savepoint + stats + release, then one lookup and one insert per chunk
+        with self.assertNumQueries(3 + 2 * 5):
+            data = execute(self.MUTATION, customers=rows, batchSize=10)
+        self.assertEqual(len(data["bulkCreateCustomers"]["customers"]), 50)
+
+
+class OrderCreationTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.products = Product.objects.bulk_create(
+            [Product(name="Laptop", price="999.99", stock=10), Product(name="Phone", price="499.99", stock=10)]
+        )
+
+    CREATE = """
+        mutation ($customerId: ID!, $productIds: [ID]!) {
+          createOrder(customerId: $customerId, productIds: $productIds) { order { totalAmount } }
+        }
+    """
+
+    def test_create_order_inserts_once(self):
+        ids = [p.pk for p in self.products]
+        # customer + savepoint + locked products + savepoint + stock + release
+        # + order + stats + daily rollup + through rows + product rollup + release
+        with self.assertNumQueries(12):
+            data = execute(self.CREATE, customerId=self.customer.pk, productIds=ids)
+        self.assertEqual(data["createOrder"]["order"]["totalAmount"], "1499.98")
+        order = Order.objects.get()
+        self.assertEqual(order.products.count(), 2)
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [9, 9])
+
+    def test_create_order_shortage_rolls_back(self):
+        Product.objects.filter(name="Phone").update(stock=0)
+        result = schema.execute(
+            self.CREATE, variable_values={"customerId": self.customer.pk, "productIds": [p.pk for p in self.products]},
+            context_value=RequestFactory().post("/graphql"),
+        )
+        self.assertEqual(result.errors[0].message, "Insufficient stock for: Phone")
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [10, 0])
+
+    def test_reserve_stock_guard(self):
+        laptop, phone = self.products
+        # Stock read before another order took it: the guarded UPDATE refuses.
+        locked = bulk.lock_products([laptop.pk, phone.pk])
+        Product.objects.filter(pk=phone.pk).update(stock=1)
+        with self.assertRaises(bulk.InsufficientStock):
+            bulk.reserve_stock({laptop.pk: 2, phone.pk: 2}, locked=locked)
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [10, 1])
+        bulk.reserve_stock({laptop.pk: 3, phone.pk: 1})
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [7, 0])
+
+    def test_bulk_create_orders(self):
+        mutation = """
+            mutation ($orders: [OrderInput]!) {
+              bulkCreateOrders(orders: $orders, batchSize: 2) { orders { totalAmount } errors }
+            }
+        """
+        laptop, phone = (p.pk for p in self.products)
+        rows = [{"customerId": self.customer.pk, "productIds": [laptop]} for _ in range(5)]
+        rows += [
+            {"customerId": 0, "productIds": [laptop]},
+            {"customerId": self.customer.pk, "productIds": []},
+            {"customerId": self.customer.pk, "productIds": [laptop, laptop]},
+            {"customerId": self.customer.pk, "productIds": [laptop, phone]},
+        ]
+        Product.objects.filter(pk=laptop).update(stock=5)
+        rows.append({"customerId": self.customer.pk, "productIds": [laptop]})
+        data = execute(mutation, orders=rows)["bulkCreateOrders"]
+        self.assertEqual(data["errors"], [
+            "Row 5: Invalid customer ID",
+            "Row 6: At least one product must be selected",
+            "Row 7: One or more product IDs are invalid",
+            "Row 8: Insufficient stock for: Laptop",
+            "Row 9: Insufficient stock for: Laptop",
+        ])
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(Order.products.through.objects.count(), 5)
+        self.assertEqual(list(Product.objects.order_by("pk").values_list("stock", flat=True)), [0, 10])
+
+    def test_recalculate_total(self):
+        order = Order.objects.create(customer=self.customer)
+        order.products.set(self.products)
+        order.recalculate_total()
+        order.refresh_from_db()
+        self.assertEqual(str(order.total_amount), "1499.98")
+
+
+class CrmStatsTests(TestCase):
+    TOTALS = "{ totalCustomers totalOrders totalRevenue }"
+
+    def test_totals_follow_writes(self):
+        seed_orders(3)  # bulk inserts, counted by hand below
+        rebuild()
+        customer = Customer.objects.create(name="Eve", email="eve@example.com")
+        Order.objects.create(customer=customer, total_amount="12.50")
+        bulk.create_orders([SimpleNamespace(customer_id=customer.pk, product_ids=[Product.objects.first().pk])])
+        Order.objects.filter(customer__email="customer0@example.com").delete()
+
+        with self.assertNumQueries(1):
+            data = execute(self.TOTALS)
+        self.assertEqual(data, {"totalCustomers": 4, "totalOrders": 4, "totalRevenue": 22.5})
+
+        Customer.objects.filter(pk=customer.pk).delete()
+        data = execute(self.TOTALS)
+        self.assertEqual(data, {"totalCustomers": 3, "totalOrders": 2, "totalRevenue": 0.0})
+
+    def test_reconcile_command_fixes_drift(self):
+        seed_orders(2)
+        CrmStats.objects.filter(pk=1).update(customer_count=99, order_count=-5)
+        call_command("crm_reconcile_stats", stdout=StringIO())
+        stats = CrmStats.objects.get(pk=1)
+        self.assertEqual((stats.customer_count, stats.order_count), (2, 2))
+
+
+class FilterTests(TestCase):
+    def test_phone_pattern_is_a_prefix_match(self):
+        Customer.objects.bulk_create([
+            Customer(name="A", email="a@example.com", phone="+1555"),
+            Customer(name="B", email="b@example.com", phone="+19"),
+            Customer(name="C", email="c@example.com", phone="+2555"),
+            Customer(name="D", email="d@example.com"),
+        ])
+        data = execute('{ allCustomers(phonePattern: "+1") { edges { node { name } } } }')
+        self.assertEqual([e["node"]["name"] for e in data["allCustomers"]["edges"]], ["A", "B"])
+
+        # No code point follows U+10FFFF, so this one can't be a range.
+        query = "query ($p: String) { allCustomers(phonePattern: $p) { edges { node { name } } } }"
+        for pattern in ("+1\U0010ffff", "+1\ud7ff"):
+            self.assertEqual(execute(query, p=pattern)["allCustomers"]["edges"], [])
+
+
+class KeysetPaginationTests(TestCase):
+    QUERY = """
+        query ($first: Int, $after: String, $last: Int, $before: String, $orderBy: [String], $offset: Int) {
+          allOrders(first: $first, after: $after, last: $last, before: $before, orderBy: $orderBy, offset: $offset) {
+            edges { cursor node { id totalAmount } }
+            pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+          }
+        }
+    """
+
+    def setUp(self):
+        orders = seed_orders(23)
+        # Repeated totals so the id tie-breaker matters.
+        for i, order in enumerate(orders):
+            order.total_amount = i % 4
+        Order.objects.bulk_update(orders, ["total_amount"])
+        self.expected = [
+            o.pk for o in Order.objects.order_by("-total_amount", "-id")
+        ]
+
+    def page_ids(self, data):
+        return [int(from_global_id(e["node"]["id"])[1]) for e in data["allOrders"]["edges"]]
+
+    def test_forward_pages_cover_every_row_once(self):
+        seen, after = [], None
+        while True:
+            data = execute(self.QUERY, first=5, after=after, orderBy=["-totalAmount"])
+            seen += self.page_ids(data)
+            info = data["allOrders"]["pageInfo"]
+            if not info["hasNextPage"]:
+                break
+            after = info["endCursor"]
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_pages_cover_every_row_once(self):
+        seen, before = [], None
+        while True:
+            data = execute(self.QUERY, last=5, before=before, orderBy=["-totalAmount"])
+            seen = self.page_ids(data) + seen
+            info = data["allOrders"]["pageInfo"]
+            if not info["hasPreviousPage"]:
+                break
+            before = info["startCursor"]
+        self.assertEqual(seen, self.expected)
+
+    def test_pages_seek_instead_of_offset(self):
+        first = execute(self.QUERY, first=5, orderBy=["-total_amount"])
+        after = first["allOrders"]["pageInfo"]["endCursor"]
+        with self.assertNumQueries(1) as ctx:
+            data = execute(self.QUERY, first=5, after=after, orderBy=["-total_amount"])
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn("OFFSET", sql)
+        self.assertIn("LIMIT 6", sql)
+        self.assertEqual(self.page_ids(data), self.expected[5:10])
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        after = execute(self.QUERY, first=1)["allOrders"]["pageInfo"]["endCursor"]
+        result = schema.execute(
+            self.QUERY, variable_values={"first": 1, "after": after, "orderBy": ["-totalAmount"]},
+            context_value=RequestFactory().post("/graphql"),
+        )
+        self.assertIn("ordering", result.errors[0].message)
+
+    def test_malformed_cursor_is_rejected(self):
+        after = execute(self.QUERY, first=1)["allOrders"]["pageInfo"]["endCursor"]
+        payload = json.loads(base64.b64decode(after).decode()[len("keyset:"):])
+        for cursor in (
+            "keyset:[]",
+            "keyset:" + json.dumps({**payload, "v": payload["v"][:-1]}),
+            "keyset:" + json.dumps({**payload, "v": ["x"] * len(payload["v"])}),
+        ):
+            result = schema.execute(
+                self.QUERY, variable_values={"first": 1, "after": base64.b64encode(cursor.encode()).decode()},
+                context_value=RequestFactory().post("/graphql"),
+            )
+            self.assertEqual([e.message for e in result.errors], ["Invalid cursor"], cursor)
+
+    def test_offset_still_works(self):
+        data = execute(self.QUERY, first=3, offset=4, orderBy=["-totalAmount"])
+        self.assertEqual(self.page_ids(data), self.expected[4:7])
+
+
+class ConnectionCountTests(TestCase):
+    def setUp(self):
+        seed_orders(23)
+
+    def test_offset_pages_skip_count(self):
+        with self.assertNumQueries(1) as ctx:
+            data = execute('{ allOrders(first: 5, offset: 5) { edges { node { id } } pageInfo { hasNextPage } } }')
+        self.assertNotIn("COUNT", ctx.captured_queries[0]["sql"])
+        self.assertEqual(len(data["allOrders"]["edges"]), 5)
+        self.assertTrue(data["allOrders"]["pageInfo"]["hasNextPage"])
+
+    def test_total_count_when_selected(self):
+        data = execute('{ allOrders(first: 5, totalAmountGte: 0) { totalCount edges { node { id } } } }')
+        self.assertEqual(data["allOrders"]["totalCount"], 23)
+
+    def test_capped_total_count(self):
+        with self.assertNumQueries(2) as ctx:
+            data = execute("{ allOrders(first: 1) { totalCount(atMost: 10) } }")
+        self.assertEqual(data["allOrders"]["totalCount"], 11)
+        self.assertIn("LIMIT 11", ctx.captured_queries[1]["sql"])
+        data = execute("{ allOrders(first: 1) { totalCount(atMost: 100) } }")
+        self.assertEqual(data["allOrders"]["totalCount"], 23)
+
+    def test_negative_at_most_rejected(self):
+        result = schema.execute(
+            "{ allOrders(first: 1) { totalCount(atMost: -1) } }", context_value=RequestFactory().post("/graphql"),
+        )
+        self.assertEqual([e.message for e in result.errors], ["atMost must not be negative"])
+
+
+class ImportCommandTests(TestCase):
+    def run_import(self, kind, content, suffix, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command("crm_import", kind, f.name, "--batch-size", "2", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_customers_products_and_orders(self):
+        out, err = self.run_import("customers", (
+            "name,email,phone\n"
+            "Alice,alice@example.com,+1234567\n"
+            "Bob,bob@example.com,\n"
+            "Bob,bob@example.com,\n"
+            "Carol,carol@example.com,not-a-phone\n"
+        ), ".csv")
+        self.assertIn("Imported 2 customers, rejected 2", out)
+        self.assertIn("line 4: Email already exists: bob@example.com", err)
+        self.assertIn("line 5: carol@example.com: Invalid phone format", err)
+
+        out, err = self.run_import("products", "\n".join([
+            '{"name": "Laptop", "price": "999.99", "stock": 3}',
+            '{"name": "Phone", "price": 499.99, "stock": 2}',
+            '{"name": "Free", "price": 0}',
+        ]), ".jsonl")
+        self.assertIn("Imported 2 products, rejected 1", out)
+        self.assertIn("line 3: Price must be positive", err)
+
+        out, err = self.run_import("products", "\n".join([
+            '{"name": "Broken", "price": "NaN"}',
+            '{"name": "Huge", "price": Infinity}',
+            '[1, 2]',
+            '"Laptop"',
+            '{"name": "Cut short", "price": ',
+            '{"name": "Mouse", "price": "19.99", "stock": 5}',
+        ]), ".jsonl")
+        self.assertIn("Imported 1 products, rejected 5", out)
+        self.assertIn("line 1: price and stock must be numbers", err)
+        self.assertIn("line 2: price and stock must be numbers", err)
+        self.assertIn("line 3: each line must be a JSON object", err)
+        self.assertIn("line 4: each line must be a JSON object", err)
+        self.assertIn("line 5: invalid JSON", err)
+        Product.objects.get(name="Mouse").delete()
+
+        laptop, phone = Product.objects.order_by("id").values_list("id", flat=True)
+        out, err = self.run_import("orders", (
+            "customer_email,product_ids\n"
+            f"alice@example.com,{laptop};{phone}\n"
+            f"bob@example.com,{phone}\n"
+            f"nobody@example.com,{phone}\n"
+            f"alice@example.com,{phone}\n"
+        ), ".csv", "--reserve-stock")
+        self.assertIn("Imported 2 orders, rejected 2", out)
+        self.assertIn("line 4: Invalid customer ID", err)
+        self.assertIn("line 5: Insufficient stock for: Phone", err)
+        self.assertEqual(dict(Product.objects.values_list("name", "stock")), {"Laptop": 2, "Phone": 0})
+        alice = Order.objects.get(customer__email="alice@example.com")
+        self.assertEqual(str(alice.total_amount), "1499.98")
+        self.assertEqual(alice.products.count(), 2)
+        self.assertEqual(execute("{ totalOrders }")["totalOrders"], 2)
+
+    def test_orders_leave_stock_alone_by_default(self):
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        product = Product.objects.create(name="Sold out", price=10, stock=0)
+        out, err = self.run_import("orders", (
+            "customer_email,product_ids\n"
+            f"alice@example.com,{product.pk}\n"
+            f"alice@example.com,{product.pk}\n"
+        ), ".csv")
+        self.assertIn("Imported 2 orders, rejected 0", out)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(str(Order.objects.first().total_amount), "10.00")
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class ProfilingTests(TestCase):
+    QUERY = "{ allOrders(first: 5) { edges { node { id customer { name } products { name } } } } totalOrders }"
+
+    def post(self, **headers):
+        response = self.client.post("/graphql", {"query": self.QUERY}, content_type="application/json", **headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_not_profiled_by_default(self):
+        seed_orders(3)
+        with self.assertNoLogs("crm.profile"):
+            body = self.post(HTTP_X_CRM_PROFILE="1")
+        # The header is ignored outside DEBUG for anonymous users.
+        self.assertNotIn("profile", body["extensions"])
+
+    @override_settings(DEBUG=True)
+    def test_header_returns_profile(self):
+        seed_orders(3)
+        with self.assertLogs("crm.profile") as logs:
+            body = self.post(HTTP_X_CRM_PROFILE="1")
+        profile = body["extensions"]["profile"]
+        self.assertEqual(len(body["data"]["allOrders"]["edges"]), 3)
+
+        # Page plus products for the connection, one stats read for the total.
+        self.assertEqual(profile["rootFields"]["allOrders"]["queries"], 2)
+        self.assertEqual(profile["rootFields"]["totalOrders"]["queries"], 1)
+        self.assertEqual(profile["queries"], 3)
+        self.assertEqual(profile["paths"]["allOrders.edges.node.customer"]["calls"], 3)
+        self.assertEqual(profile["paths"]["allOrders.edges.node.customer"]["queries"], 0)
+        self.assertNotIn("allOrders.edges.node.id", profile["paths"])
+        self.assertIn('"event":"graphql_profile"', logs.output[0])
+
+    def test_sampled_requests_are_logged_only(self):
+        with override_settings(CRM_PROFILE_SAMPLE_RATE=1), self.assertLogs("crm.profile") as logs:
+            body = self.post()
+        self.assertNotIn("profile", body["extensions"])
+        self.assertIn('"rootFields"', logs.output[0])
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class PersistedQueryTests(TestCase):
+    def setUp(self):
+        self.documents = get_document_cache(schema.graphql_schema)
+        self.documents.clear()
+
+    def post(self, **payload):
+        return self.client.post("/graphql", payload, content_type="application/json").json()
+
+    def persisted(self, sha256):
+        return {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+
+    def test_registered_operation_by_hash(self):
+        body = self.post(extensions=self.persisted(query_hash(CRM_REPORT)))
+        self.assertEqual(body["data"], {"totalCustomers": 0, "totalOrders": 0, "totalRevenue": 0.0})
+
+    def test_unknown_hash_then_text(self):
+        query = "{ totalOrders }"
+        body = self.post(extensions=self.persisted(query_hash(query)))
+        self.assertEqual(body["errors"][0]["extensions"]["code"], "PERSISTED_QUERY_NOT_FOUND")
+
+        body = self.post(query=query, extensions=self.persisted(query_hash(query)))
+        self.assertEqual(body["data"], {"totalOrders": 0})
+        body = self.post(extensions=self.persisted(query_hash(query)))
+        self.assertEqual(body["data"], {"totalOrders": 0})
+
+        body = self.post(query="{ totalCustomers }", extensions=self.persisted(query_hash(query)))
+        self.assertEqual(body["errors"][0]["message"], "provided sha does not match query")
+
+    def test_plain_queries_are_parsed_once(self):
+        for _ in range(3):
+            self.assertEqual(self.post(query="{ totalOrders }")["data"], {"totalOrders": 0})
+        self.assertEqual((self.documents.misses, self.documents.hits), (1, 2))
+
+        # Invalid documents are not cached.
+        for _ in range(2):
+            self.assertIn("errors", self.post(query="{ nope }"))
+        self.assertEqual(self.documents.misses, 3)
+
+
+RESPONSE_CACHE = {
+    "CACHE": "graphql",
+    "SINGLE_PROCESS": True,
+    "FIELDS": {"Query.totalCustomers": 60, "Query.totalOrders": 60, "Query.allProducts": 60},
+}
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0, CRM_RESPONSE_CACHE=RESPONSE_CACHE)
+class ResponseCacheTests(TestCase):
+    PRODUCTS = "{ allProducts(first: 10) { edges { node { name stock } } } }"
+
+    def setUp(self):
+        caches["graphql"].clear()
+
+    def post(self, query):
+        return self.client.post("/graphql", {"query": query}, content_type="application/json").json()["data"]
+
+    def test_totals_cached_until_a_write(self):
+        query = "{ totalCustomers totalOrders }"
+        self.assertEqual(self.post(query), {"totalCustomers": 0, "totalOrders": 0})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post(query), {"totalCustomers": 0, "totalOrders": 0})
+
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        self.assertEqual(self.post(query), {"totalCustomers": 1, "totalOrders": 0})
+        # A product write leaves the totals alone.
+        Product.objects.create(name="Laptop", price=999, stock=3)
+        with self.assertNumQueries(0):
+            self.post(query)
+
+    def test_uncached_operations(self):
+        self.post("{ totalOrders allOrders(first: 1) { edges { node { id } } } }")
+        with self.assertNumQueries(2):
+            self.post("{ totalOrders allOrders(first: 1) { edges { node { id } } } }")
+
+    def test_bulk_update_invalidates(self):
+        Product.objects.create(name="Laptop", price=999, stock=3)
+        self.assertEqual(self.post(self.PRODUCTS)["allProducts"]["edges"][0]["node"]["stock"], 3)
+        UpdateLowStockProducts.mutate(None, None)
+        self.assertEqual(self.post(self.PRODUCTS)["allProducts"]["edges"][0]["node"]["stock"], 13)
+
+    def test_per_process_backend_refused(self):
+        with override_settings(CRM_RESPONSE_CACHE={**RESPONSE_CACHE, "SINGLE_PROCESS": False}):
+            with self.assertRaisesMessage(ImproperlyConfigured, "shared between processes"):
+                Customer.objects.create(name="Alice", email="alice@example.com")
+
+    def test_file_backend_and_bulk_import(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory}
+        with override_settings(CACHES={"default": cache, "graphql": cache}):
+            self.assertEqual(self.post(self.PRODUCTS)["allProducts"]["edges"], [])
+            with self.assertNumQueries(0):
+                self.post(self.PRODUCTS)
+            with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+                f.write('{"name": "Phone", "price": 499, "stock": 5}\n')
+            self.addCleanup(os.remove, f.name)
+            call_command("crm_import", "products", f.name, stdout=StringIO())
+            self.assertEqual(len(self.post(self.PRODUCTS)["allProducts"]["edges"]), 1)
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class AsyncViewTests(TestCase):
+    async def post(self, query):
+        response = await AsyncClient().post("/graphql/async", {"query": query}, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertNotIn("errors", body)
+        return body["data"]
+
+    async def test_same_results_as_sync_view(self):
+        await sync_to_async(seed_orders)(3)
+        await sync_to_async(rebuild)()
+        for query in [
+            "{ totalCustomers totalOrders totalRevenue }",
+            "{ allOrders(first: 2) { totalCount edges { node { id customer { name } products { name } } } } }",
+            # Async root resolvers with sync resolvers beneath them.
+            "{ orders { id customer { email } products { name } } customers { name orders { edges { node { id } } } } }",
+        ]:
+            expected = await sync_to_async(execute)(query)
+            self.assertEqual(await self.post(query), expected)
+
+    async def test_mutation(self):
+        data = await self.post('mutation { createCustomer(name: "Alice", email: "alice@example.com") { customer { name } } }')
+        self.assertEqual(data["createCustomer"]["customer"]["name"], "Alice")
+        self.assertEqual((await self.post("{ totalCustomers }"))["totalCustomers"], 1)
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class QueryCostTests(TestCase):
+    NESTED = "query($n: Int) { allCustomers(first: $n) { edges { node { orders { edges { node { id } } } } } } }"
+
+    def post(self, query, path="/graphql", **variables):
+        return self.client.post(path, {"query": query, "variables": variables}, content_type="application/json")
+
+    def test_cost_reported(self):
+        body = self.post("{ allOrders(first: 20) { totalCount edges { node { customer { name } } } } }").json()
+        # allOrders 1, totalCount 10, 20 customers.
+        self.assertEqual(body["extensions"]["cost"], {"requested": 31, "maximum": 10_000, "depth": 2, "maxDepth": 8})
+
+    def test_variables_set_page_size(self):
+        # allCustomers 1, n x (orders 1 + 100 order edges x id 0).
+        self.assertEqual(self.post(self.NESTED, n=5).json()["extensions"]["cost"]["requested"], 6)
+        self.assertEqual(self.post(self.NESTED, n=50).json()["extensions"]["cost"]["requested"], 51)
+
+    def test_fragment_reused_at_nested_level(self):
+        # Each spread of G is costed, not only the outermost one.
+        nested = "customer { orders(first: 100) { edges { node { %s } } } }"
+        inline = self.post("{ allOrders(first: 100) { edges { node { %s } } } }" % (
+            "id customer { name } " + nested % "id customer { name }"
+        ))
+        spread = self.post("{ allOrders(first: 100) { edges { node { %s } } } } %s" % (
+            "...G " + nested % "...G", "fragment G on OrderType { id customer { name } }"
+        ))
+        self.assertEqual(spread.status_code, 400)
+        error = spread.json()["errors"][0]["extensions"]
+        self.assertEqual(error["code"], "QUERY_TOO_COSTLY")
+        # 100 orders x (customer + its 100 orders x customer), as when inlined.
+        self.assertEqual(error["cost"], 10_301)
+        self.assertEqual(inline.json()["errors"][0]["extensions"]["cost"], 10_301)
+
+    def test_duplicate_spreads_measured_once(self):
+        # Expanded, F0 would spread F30 2^30 times.
+        fragments = " ".join(f"fragment F{i} on Query {{ ...F{i + 1} ...F{i + 1} }}" for i in range(30))
+        query = f"{{ ...F0 }} {fragments} fragment F30 on Query {{ allOrders(first: 1) {{ totalCount }} }}"
+        started = time.monotonic()
+        response = self.post(query)
+        self.assertLess(time.monotonic() - started, 2)
+        error = response.json()["errors"][0]["extensions"]
+        # allOrders 1 + totalCount 10, 2^30 times.
+        self.assertEqual((error["code"], error["cost"]), ("QUERY_TOO_COSTLY", 11 * 2**30))
+
+    @override_settings(CRM_QUERY_COST={"MAX_COST": 40})
+    def test_costly_query_rejected_before_sql(self):
+        with self.assertNumQueries(0):
+            response = self.post(self.NESTED, n=50)
+        self.assertEqual(response.status_code, 400)
+        error = response.json()["errors"][0]
+        self.assertEqual(error["extensions"], {"code": "QUERY_TOO_COSTLY", "cost": 51, "maxCost": 40})
+
+        with self.assertNumQueries(0):
+            response = async_to_sync(AsyncClient().post)(
+                "/graphql/async", {"query": self.NESTED, "variables": {"n": 50}}, content_type="application/json"
+            )
+        self.assertEqual(response.json()["errors"][0]["extensions"]["code"], "QUERY_TOO_COSTLY")
+        self.assertEqual(self.post(self.NESTED, n=10).status_code, 200)
+
+    def test_deep_query_rejected(self):
+        selection = "id"
+        for _ in range(4):
+            selection = f"customer {{ orders(first: 1) {{ edges {{ node {{ {selection} }} }} }} }}"
+        response = self.post(f"{{ orders {{ {selection} }} }}")
+        self.assertEqual(response.status_code, 400)
+        error = response.json()["errors"][0]
+        self.assertEqual(error["extensions"], {"code": "QUERY_TOO_DEEP", "depth": 9, "maxDepth": 8})
+
+
+class OrderExportTests(TestCase):
+    def export(self, **params):
+        response = self.client.get("/graphql/export/orders", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_in_constant_queries(self):
+        seed_orders(5)
+        # Orders with customers, products for the one chunk.
+        with self.assertNumQueries(2):
+            lines = self.export().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([r["customerEmail"] for r in rows], [f"customer{i}@example.com" for i in range(5)])
+        self.assertEqual(rows[0]["products"], ["Product 0", "Product 1"])
+
+    def test_csv_with_filters(self):
+        orders = seed_orders(4)
+        Order.objects.filter(pk=orders[0].pk).update(total_amount=50)
+        rows = list(csv.reader(StringIO(self.export(format="csv", totalAmountGte=10))))
+        self.assertEqual(rows[0][0], "id")
+        self.assertEqual([r[0] for r in rows[1:]], [str(orders[0].pk)])
+        self.assertEqual(rows[1][-1], "Product 0|Product 1")
+
+        # Both products match; each order is still listed once.
+        lines = self.export(product_name="Product").splitlines()
+        self.assertEqual(len(lines), 4)
+
+    def test_invalid_arguments(self):
+        self.assertEqual(self.client.get("/graphql/export/orders", {"format": "xml"}).status_code, 400)
+        response = self.client.get("/graphql/export/orders", {"orderDateGte": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("order_date_gte", response.json()["errors"])
+
+
+class RestockTests(TestCase):
+    def setUp(self):
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {stock}", price=10, stock=stock) for stock in (0, 12, 5, 9, 3)
+        )
+
+    def restock(self, **arguments):
+        data = execute(
+            """
+            mutation($threshold: Int, $increment: Int, $batchSize: Int) {
+              updateLowStockProducts(threshold: $threshold, increment: $increment, batchSize: $batchSize) {
+                message updatedProducts { name stock }
+              }
+            }
+            """,
+            **arguments,
+        )
+        return data["updateLowStockProducts"]
+
+    def test_returns_every_restocked_product(self):
+        result = self.restock()
+        # Products 5 and 9 end at or above the threshold and are still returned.
+        self.assertEqual(
+            [(p["name"], p["stock"]) for p in result["updatedProducts"]],
+            [("Product 0", 10), ("Product 5", 15), ("Product 9", 19), ("Product 3", 13)],
+        )
+        self.assertEqual(result["message"], "Successfully restocked 4 low-stock product(s).")
+        self.assertEqual(Product.objects.get(name="Product 12").stock, 12)
+
+    def test_chunks_restock_each_product_once(self):
+        for locked in (False, True):
+            with self.subTest(locked=locked), mock.patch("crm.bulk._can_update_returning", return_value=not locked):
+                Product.objects.update(stock=0)
+                result = self.restock(threshold=100, increment=1, batchSize=2)
+                self.assertEqual([p["stock"] for p in result["updatedProducts"]], [1] * 5)
+                self.assertEqual(set(Product.objects.values_list("stock", flat=True)), {1})
+
+    def test_short_chunk_does_not_end_the_sweep(self):
+        real = bulk._restock_returning
+
+        def first_chunk_short(threshold, increment, last, batch_size):
+            # As when a concurrent restock drops a scanned row from the update.
+            return real(threshold, increment, last, batch_size - 1 if last == 0 else batch_size)
+
+        with mock.patch("crm.bulk._restock_returning", side_effect=first_chunk_short):
+            result = self.restock(threshold=100, increment=1, batchSize=2)
+        self.assertEqual(len(result["updatedProducts"]), 5)
+
+    def test_nothing_to_restock(self):
+        result = self.restock(threshold=0)
+        self.assertEqual(result, {"message": "No low-stock products found to update.", "updatedProducts": []})
+
+
+class TestClientSession:
+    # Stands in for requests.Session in crm.operations, posting through the
+    # Django test client.
+    def __init__(self, client):
+        self.client = client
+        self.sent = []
+
+    def post(self, url, json, timeout):
+        self.sent.append(json)
+        return self.client.post(url, json, content_type="application/json")
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class JobOperationTests(TestCase):
+    def test_in_process(self):
+        seed_orders(3)
+        rebuild()
+        with self.assertNumQueries(1):
+            data = run_operation(CRM_REPORT)
+        self.assertEqual(data, {"totalCustomers": 3, "totalOrders": 3, "totalRevenue": 0.0})
+        with self.assertRaises(GraphQLRequestError):
+            run_operation("{ totalCustomers nope }")
+
+    def test_http_with_cached_schema(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "schema.json")
+        session = TestClientSession(self.client)
+
+        with mock.patch("crm.operations._session", return_value=session):
+            self.assertEqual(execute_remote("/graphql", CRM_REPORT, schema_cache=path)["totalOrders"], 0)
+            self.assertIn("__schema", session.sent[0]["query"])
+            self.assertEqual(len(session.sent), 2)
+
+            # The cached schema is reused; only the persisted query is sent.
+            execute_remote("/graphql", CRM_REPORT, schema_cache=path)
+            self.assertEqual(len(session.sent), 3)
+            self.assertNotIn("query", session.sent[2])
+
+            # A document the cached schema rejects refreshes it once.
+            with self.assertRaises(GraphQLRequestError):
+                execute_remote("/graphql", "{ nope }", schema_cache=path)
+            self.assertEqual(len(session.sent), 4)
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0)
+class OrderReminderTests(TestCase):
+    def test_incremental_and_grouped_per_customer(self):
+        orders = seed_orders(3)
+        Order.objects.create(customer=orders[0].customer)
+        since = (timezone.now() - timedelta(days=7)).date().isoformat()
+
+        # Two pages of orders, each read with its customers in one query.
+        with self.assertNumQueries(2):
+            reminders, state = pending_reminders(since, {}, page_size=3)
+        self.assertEqual(
+            sorted((email, len(ids)) for email, ids in reminders.values()),
+            [("customer0@example.com", 2), ("customer1@example.com", 1), ("customer2@example.com", 1)],
+        )
+        self.assertEqual(from_global_id(state["lastOrderId"])[1], str(Order.objects.latest("pk").pk))
+
+        # The next run only sees orders placed since.
+        self.assertEqual(pending_reminders(since, state)[0], {})
+        order = Order.objects.create(customer=orders[1].customer)
+        reminders, state = pending_reminders(since, state)
+        self.assertEqual(list(reminders.values()), [("customer1@example.com", [to_global_id("OrderType", order.pk)])])
+
+        # Orders outside the window are never read.
+        Order.objects.update(order_date=timezone.now() - timedelta(days=30))
+        self.assertEqual(pending_reminders(since, {})[0], {})
+
+    def test_state_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "state.json")
+        self.assertEqual(load_state(path), {})
+        save_state({"cursor": "abc"}, path)
+        self.assertEqual(load_state(path), {"cursor": "abc"})
+
+
+class CleanupInactiveTests(TestCase):
+    def setUp(self):
+        orders = seed_orders(5)
+        old = timezone.now() - timedelta(days=400)
+        # Customers 0-2 signed up long ago; 0 and 1 have only old orders,
+        # 2 also has a recent one. 3 and 4 are new.
+        Customer.objects.filter(pk__in=[o.customer_id for o in orders[:3]]).update(created_at=old)
+        Order.objects.filter(pk__in=[o.pk for o in orders[:3]]).update(order_date=old, total_amount=10)
+        Order.objects.create(customer=orders[2].customer, total_amount=5)
+        rebuild()
+        self.inactive = {orders[0].customer_id, orders[1].customer_id}
+
+    def cleanup(self, *args):
+        out = StringIO()
+        call_command("crm_cleanup_inactive", "--batch-size", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run(self):
+        self.assertIn("Would delete 2 inactive customers and 2 orders.", self.cleanup("--dry-run"))
+        self.assertEqual(Customer.objects.count(), 5)
+
+    def test_deletes_inactive_customers_with_their_orders(self):
+        out = self.cleanup()
+        self.assertIn("Deleted 2 inactive customers, 2 orders and 4 order products", out)
+        self.assertFalse(Customer.objects.filter(pk__in=self.inactive).exists())
+        self.assertFalse(Order.products.through.objects.filter(order__customer_id__in=self.inactive).exists())
+        self.assertEqual(Customer.objects.count(), 3)
+
+        stats = CrmStats.objects.get()
+        self.assertEqual((stats.customer_count, stats.order_count, stats.revenue), (3, 4, 15))
+        rebuild()
+        self.assertEqual(CrmStats.objects.get().revenue, 15)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.customers = Customer.objects.bulk_create([
+            Customer(name="Alice Johnson", email="alice@example.com"),
+            Customer(name="Bob Stone", email="johnson.b@example.com"),
+            Customer(name='Carol "CJ" Ng', email="carol@example.com"),
+        ])
+        products = Product.objects.bulk_create([
+            Product(name="Widget", price=5), Product(name="Blue Widget Deluxe Edition", price=9),
+            Product(name="Gadget", price=7),
+        ])
+        order = Order.objects.create(customer=self.customers[2])
+        order.products.set(products[1:])
+
+    def names(self, **data):
+        return sorted(CustomerFilter(data, queryset=Customer.objects.all()).qs.values_list("name", flat=True))
+
+    def search(self, field, text):
+        query = f"{{ {field}(search: {json.dumps(text)}) {{ edges {{ node {{ name }} }} }} }}"
+        return [e["node"]["name"] for e in execute(query)[field]["edges"]]
+
+    def test_contains_filters_match_icontains(self):
+        for value in ["JOHN", "son", "Jo", 'l "cj', "johnson.b", "nobody", "%"]:
+            with self.subTest(value=value):
+                expected = sorted(Customer.objects.filter(name__icontains=value).values_list("name", flat=True))
+                self.assertEqual(self.names(name_icontains=value), expected)
+        self.assertEqual(self.names(email_icontains="JOHNSON"), ["Bob Stone"])
+
+        orders = OrderFilter({"product_name": "widget", "customer_name": "carol"}, queryset=Order.objects.all())
+        self.assertEqual(orders.qs.count(), 1)
+
+    def test_index_follows_writes(self):
+        alice, bob, carol = self.customers
+        Customer.objects.filter(pk=bob.pk).update(name="Robert Johnson")
+        carol.name = "Carol Johnson"
+        carol.save()
+        Customer.objects.create(name="Dan Johnson", email="dan@example.com")
+        alice.delete()
+        bulk.delete_customers([bob.pk])
+        self.assertEqual(self.names(name_icontains="johnson"), ["Carol Johnson", "Dan Johnson"])
+        self.assertEqual(self.names(search="johnson"), ["Carol Johnson", "Dan Johnson"])
+
+    def test_ranked_search(self):
+        # Every term has to match, in any indexed column.
+        self.assertEqual(sorted(self.search("allCustomers", "johnson")), ["Alice Johnson", "Bob Stone"])
+        self.assertEqual(self.search("allCustomers", "alice john"), ["Alice Johnson"])
+        self.assertEqual(self.search("allCustomers", "ng cj"), ['Carol "CJ" Ng'])
+        # The shorter name is the better match.
+        self.assertEqual(self.search("allProducts", "widget"), ["Widget", "Blue Widget Deluxe Edition"])
+
+        query = """query ($after: String) {
+          allProducts(search: "dget", first: 1, after: $after) { edges { cursor node { name } } }
+        }"""
+        first = execute(query)["allProducts"]["edges"]
+        second = execute(query, after=first[0]["cursor"])["allProducts"]["edges"]
+        self.assertEqual([e["node"]["name"] for e in first + second], ["Widget", "Gadget"])
+
+
+@override_settings(CRM_PROFILE_SAMPLE_RATE=0, CRM_READ_REPLICA="replica")
+class ConnectionProfileTests(TestCase):
+    def test_new_connections_apply_pragmas(self):
+        # The test database is in memory, where WAL doesn't apply; open a file.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = connections["default"].__class__(
+            {**connections["default"].settings_dict, "NAME": os.path.join(directory, "profile.sqlite3")}, "profile",
+        )
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            pragmas = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store"):
+                cursor.execute(f"PRAGMA {name}")
+                pragmas[name] = cursor.fetchone()[0]
+        # synchronous 1 is NORMAL, temp_store 2 is MEMORY.
+        self.assertEqual(pragmas, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "temp_store": 2})
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """A second SQLite file stands in for the replica; rows are written to
+    each database separately, so a read shows where it went."""
+
+    # The replica is added here rather than in `databases`, so the test
+    # runner doesn't replace it with a test database of its own.
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.settings["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(cls.directory, "replica.sqlite3"),
+        }
+        connections.configure_settings(connections.settings)
+        call_command("migrate", database="replica", verbosity=0)
+        cls.databases = {"default", "replica"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        Customer.objects.create(name="On primary", email="primary@example.com")
+        Customer.objects.using("replica").create(name="On replica", email="replica@example.com")
+
+    def names(self):
+        return list(Customer.objects.values_list("name", flat=True))
+
+    def post(self, query):
+        response = self.client.post("/graphql", {"query": query}, content_type="application/json")
+        self.assertNotIn("errors", response.json())
+        return response.json()["data"]
+
+    def test_queries_read_replica_mutations_write_primary(self):
+        data = self.post("{ allCustomers(first: 5) { edges { node { name } } } }")
+        self.assertEqual([e["node"]["name"] for e in data["allCustomers"]["edges"]], ["On replica"])
+
+        data = self.post('mutation { createCustomer(name: "New", email: "new@example.com") '
+                         '{ customer { name } } }')
+        self.assertEqual(data["createCustomer"]["customer"]["name"], "New")
+        self.assertEqual(self.names(), ["On primary", "New"])
+        self.assertEqual(Customer.objects.using("replica").count(), 1)
+
+    def test_reads_after_a_write_or_in_a_transaction_use_primary(self):
+        self.assertEqual(self.names(), ["On primary"])
+        with read_replica():
+            self.assertEqual(self.names(), ["On replica"])
+            with transaction.atomic():
+                self.assertEqual(self.names(), ["On primary"])
+            self.assertEqual(self.names(), ["On replica"])
+            Customer.objects.create(name="Written", email="written@example.com")
+            self.assertEqual(self.names(), ["On primary", "Written"])
+        # The next request starts over.
+        with read_replica():
+            self.assertEqual(self.names(), ["On replica"])
+
+    def test_jobs_and_export_read_replica(self):
+        CrmStats.objects.using("replica").create(customer_count=7, order_count=0, revenue=0)
+        self.assertEqual(run_operation(CRM_REPORT)["totalCustomers"], 7)
+
+        Order.objects.using("replica").create(customer=Customer.objects.using("replica").get())
+        response = self.client.get("/graphql/export/orders")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["customerName"] for row in rows], ["On replica"])
+
+
+class RevenueRollupTests(TestCase):
+    SERIES = """
+        query ($start: Date!, $end: Date!, $granularity: RevenueGranularity, $productId: ID) {
+          revenueSeries(start: $start, end: $end, granularity: $granularity, productId: $productId) {
+            start orders revenue
+          }
+        }
+    """
+
+    def setUp(self):
+        self.customers = Customer.objects.bulk_create(
+            Customer(name=f"Customer {i}", email=f"customer{i}@example.com") for i in range(3)
+        )
+        self.products = Product.objects.bulk_create(
+            [Product(name="Laptop", price="999.99", stock=10), Product(name="Phone", price="499.99", stock=10)]
+        )
+
+    def rollups(self):
+        return (
+            sorted(DailyRevenue.objects.exclude(order_count=0).values_list("day", "order_count", "revenue")),
+            sorted(DailyProductRevenue.objects.exclude(order_count=0)
+                   .values_list("day", "product_id", "order_count", "revenue")),
+        )
+
+    def test_rollups_follow_writes(self):
+        laptop, phone = (p.pk for p in self.products)
+        execute("mutation ($c: ID!, $p: [ID]!) { createOrder(customerId: $c, productIds: $p) { order { id } } }",
+                c=self.customers[0].pk, p=[laptop, phone])
+        execute("mutation ($orders: [OrderInput]!) { bulkCreateOrders(orders: $orders) { errors } }",
+                orders=[{"customerId": c.pk, "productIds": [phone]} for c in self.customers])
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(f"customer_email,product_ids\ncustomer2@example.com,{laptop}\n")
+        self.addCleanup(os.remove, f.name)
+        call_command("crm_import", "orders", f.name, stdout=StringIO(), stderr=StringIO())
+
+        order = Order.objects.create(customer=self.customers[1])
+        order.products.add(self.products[0])
+        order.recalculate_total()
+        today = timezone.localdate()
+        self.assertEqual(self.rollups()[0], [(today, 6, Decimal("4999.93"))])
+
+        order.products.remove(self.products[0])
+        order.recalculate_total()
+        Order.objects.filter(customer=self.customers[2]).first().delete()
+        with transaction.atomic():
+            bulk.delete_customers([self.customers[0].pk])
+
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+        self.assertEqual(incremental[0], [(today, 3, Decimal("1499.98"))])
+
+    def test_series_fills_gaps(self):
+        day = timezone.now().replace(year=2025, month=3, day=30, hour=12)
+        for offset, customer in [(0, 0), (0, 1), (3, 2)]:
+            order = Order.objects.create(customer=self.customers[customer], total_amount=10 * (offset + 1))
+            order.products.add(self.products[customer % 2])
+            Order.objects.filter(pk=order.pk).update(order_date=day + timedelta(days=offset))
+        call_command("crm_rebuild_rollups", stdout=StringIO())
+
+        with self.assertNumQueries(1):
+            data = execute(self.SERIES, start="2025-03-29", end="2025-04-03")["revenueSeries"]
+        self.assertEqual([(p["start"], p["orders"], p["revenue"]) for p in data], [
+            ("2025-03-29", 0, 0), ("2025-03-30", 2, 20), ("2025-03-31", 0, 0),
+            ("2025-04-01", 0, 0), ("2025-04-02", 1, 40), ("2025-04-03", 0, 0),
+        ])
+
+        data = execute(self.SERIES, start="2025-03-01", end="2025-05-31", granularity="MONTH")["revenueSeries"]
+        self.assertEqual([(p["start"], p["orders"]) for p in data],
+                         [("2025-03-01", 2), ("2025-04-01", 1), ("2025-05-01", 0)])
+        data = execute(self.SERIES, start="2025-03-30", end="2025-04-06", granularity="WEEK",
+                       productId=self.products[0].pk)["revenueSeries"]
+        self.assertEqual([(p["start"], p["orders"], p["revenue"]) for p in data],
+                         [("2025-03-24", 1, 999.99), ("2025-03-31", 1, 999.99)])
+        # An unknown product has an empty series, not the overall one.
+        data = execute(self.SERIES, start="2025-03-01", end="2025-03-31", granularity="MONTH", productId=0)
+        self.assertEqual([(p["orders"], p["revenue"]) for p in data["revenueSeries"]], [(0, 0)])
+
+        result = schema.execute(self.SERIES, variable_values={"start": "2000-01-01", "end": "2025-01-01"})
+        self.assertIn("at most", result.errors[0].message)
@@ -0,0 +1,30 @@
+import re
+
+# The rules behind CreateCustomer/CreateProduct/CreateOrder, shared with the
+# bulk paths. Each returns an error message, or None when the value is valid.
+
+PHONE_PATTERN = re.compile(r"^\+?\d[\d\-]+$")
+
+
+def phone_error(phone):
+    if phone and not PHONE_PATTERN.match(phone):
+        return "Invalid phone format"
+    return None
+
+
+def product_error(price, stock):
+    if price <= 0:
+        return "Price must be positive"
+    if stock < 0:
+        return "Stock cannot be negative"
+    return None
+
+
+def order_error(customer_found, product_ids, known_product_ids):
+    if not customer_found:
+        return "Invalid customer ID"
+    if not product_ids:
+        return "At least one product must be selected"
+    if len(set(product_ids)) != len(product_ids) or not all(p in known_product_ids for p in product_ids):
+        return "One or more product IDs are invalid"
+    return None
@@ -1,3 +1,257 @@
-from django.shortcuts import render
+import json
+from contextlib import nullcontext
+from inspect import isawaitable
 
-# Create your views here.
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast
+
+from . import response_cache
+from .async_schema import AsyncExecutionContext, SyncResolverMiddleware
+from .cost import check_cost, get_config as get_cost_config
+from .documents import get_document_cache
+from .profiling import ProfilingMiddleware, log_profile, start_profile
+from .routers import read_replica, request_routing
+
+
+def _routing_for(operation_ast):
+    if operation_ast is not None and operation_ast.operation == OperationType.QUERY:
+        return read_replica()
+    return nullcontext()
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQLView with per-request resolver profiling (see crm.profiling),
+    cached, optionally persisted, documents (see crm.documents), static
+    query cost limits (see crm.cost), an opt-in response cache for
+    queries (see crm.response_cache) and query operations read from the
+    replica (see crm.routers).
+    """
+
+    profiler = ProfilingMiddleware()
+
+    def dispatch(self, request, *args, **kwargs):
+        with request_routing():
+            return super().dispatch(request, *args, **kwargs)
+
+    @property
+    def documents(self):
+        return get_document_cache(self.schema.graphql_schema, self.validation_rules)
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        profile = request.crm_profile = start_profile(request)
+        if profile is None:
+            return self.execute_document(request, data, query, variables, operation_name, show_graphiql)
+
+        try:
+            with connection.execute_wrapper(profile):
+                return self.execute_document(request, data, query, variables, operation_name, show_graphiql)
+        finally:
+            profile.finish()
+            log_profile(profile, operation_name)
+
+    def execute_document(self, request, data, query, variables, operation_name, show_graphiql=False):
+        # GraphQLView.execute_graphql_request, with parse + validate replaced
+        # by the document cache.
+        document, operation_ast, errors = self.load_document(request, data, query, operation_name, show_graphiql)
+        if document is None:
+            return ExecutionResult(data=None, errors=errors) if errors else None
+        errors = self.check_cost(request, document, variables)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        cached, store = response_cache.lookup(
+            self.schema.graphql_schema, document, operation_ast, variables, operation_name
+        )
+        if cached is not None:
+            return ExecutionResult(data=cached)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(self.schema.graphql_schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            with _routing_for(operation_ast):
+                result = execute(self.schema.graphql_schema, document, **execute_options)
+            if store is not None and not result.errors:
+                store(result.data)
+            return result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def load_document(self, request, data, query, operation_name, show_graphiql=False):
+        """
+        Return `(document, operation_ast, errors)` for the request from the
+        document cache; `document` is None when there is nothing to execute.
+        """
+        sha256 = self.persisted_hash(request, data)
+        if not query and not sha256:
+            if show_graphiql:
+                return None, None, None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        document, errors = self.documents.get(query, sha256)
+        if errors:
+            return None, None, errors
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None, None, None
+            raise HttpError(HttpResponseNotAllowed(
+                ["POST"],
+                f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+            ))
+        return document, operation_ast, None
+
+    def check_cost(self, request, document, variables):
+        """
+        Measure `document` against the CRM_QUERY_COST limits (see crm.cost),
+        keeping the result for the response extensions; return any errors.
+        """
+        cost, errors = check_cost(self.schema.graphql_schema, document, variables)
+        request.crm_query_cost = cost
+        return errors
+
+    @staticmethod
+    def persisted_hash(request, data):
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted = (extensions or {}).get("persistedQuery") or {}
+        return persisted.get("sha256Hash")
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        if getattr(request, "crm_profile", None) is not None:
+            middleware = [*(middleware or ()), self.profiler]
+        return middleware
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = {}
+        cost = getattr(request, "crm_query_cost", None)
+        if cost:
+            config = get_cost_config()
+            extensions["cost"] = {
+                "requested": cost["cost"], "maximum": config["MAX_COST"],
+                "depth": cost["depth"], "maxDepth": config["MAX_DEPTH"],
+            }
+        profile = getattr(request, "crm_profile", None)
+        if profile is not None and profile.expose:
+            extensions["profile"] = profile.report()
+        if extensions:
+            d = {**d, "extensions": extensions}
+        return super().json_encode(request, d, pretty)
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    CRMGraphQLView for ASGI: executes `async_schema` on the event loop, so a
+    slow query doesn't hold a worker thread and independent root fields run
+    concurrently (see crm.async_schema). No GraphiQL, batching or profiling.
+    """
+
+    view_is_async = True
+    async_middleware = SyncResolverMiddleware()
+
+    def __init__(self, **kwargs):
+        from alx_backend_graphql_crm.schema import async_schema
+
+        kwargs.setdefault("schema", async_schema)
+        super().__init__(**kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        with request_routing():
+            return await self.dispatch_graphql(request)
+
+    async def dispatch_graphql(self, request):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(HttpResponseNotAllowed(
+                    ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                ))
+            data = self.parse_body(request)
+            query, variables, operation_name, id = self.get_graphql_params(request, data)
+            result = await self.execute_async(request, data, query, variables, operation_name)
+
+            status_code = 200
+            response = {}
+            if result.errors:
+                response["errors"] = [self.format_error(e) for e in result.errors]
+            if result.errors and any(not getattr(e, "path", None) for e in result.errors):
+                status_code = 400
+            else:
+                response["data"] = result.data
+            return HttpResponse(
+                status=status_code, content=self.json_encode(request, response), content_type="application/json"
+            )
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+    async def execute_async(self, request, data, query, variables, operation_name):
+        document, operation_ast, errors = self.load_document(request, data, query, operation_name)
+        if document is None:
+            return ExecutionResult(data=None, errors=errors)
+        errors = self.check_cost(request, document, variables)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        cached, store = response_cache.lookup(
+            self.schema.graphql_schema, document, operation_ast, variables, operation_name
+        )
+        if cached is not None:
+            return ExecutionResult(data=cached)
+
+        try:
+            with _routing_for(operation_ast):
+                result = execute(
+                    self.schema.graphql_schema,
+                    document,
+                    root_value=self.get_root_value(request),
+                    context_value=self.get_context(request),
+                    variable_values=variables,
+                    operation_name=operation_name,
+                    middleware=[*(self.get_middleware(request) or ()), self.async_middleware],
+                    execution_context_class=self.execution_context_class or AsyncExecutionContext,
+                )
+                if isawaitable(result):
+                    result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+        if store is not None and not result.errors:
+            store(result.data)
+        return result